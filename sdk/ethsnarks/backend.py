@@ -0,0 +1,103 @@
+"""
+Pluggable big-integer arithmetic backends
+
+Field arithmetic, the hash permutations and the curve formulas all work on
+integers of around 254 bits. The `python` backend uses the built-in `int`,
+the optional `gmpy2` backend routes the same operations through GMP `mpz`
+integers when the package is installed.
+
+The backend is selected with the `ETHSNARKS_BACKEND` environment variable
+(`python`, `gmpy2` or `auto`) or at runtime with `set_backend()`. The default,
+`auto`, picks `gmpy2` if it can be imported and falls back to `python`.
+Every backend produces identical results, and hash outputs are plain ints.
+"""
+
+import os
+
+from .numbertheory import square_root_mod_prime
+
+try:
+    import gmpy2
+except ImportError:
+    gmpy2 = None
+
+
+class PythonBackend(object):
+    name = 'python'
+
+    native = int
+
+    @staticmethod
+    def powmod(a, e, m):
+        return pow(a, e, m)
+
+    @staticmethod
+    def invert(a, m):
+        return pow(a, m - 2, m)
+
+    @staticmethod
+    def sqrt(a, m):
+        return square_root_mod_prime(a, m)
+
+
+class Gmpy2Backend(object):
+    name = 'gmpy2'
+
+    native = gmpy2.mpz if gmpy2 is not None else None
+
+    @staticmethod
+    def powmod(a, e, m):
+        return gmpy2.powmod(a, e, m)
+
+    @staticmethod
+    def invert(a, m):
+        # Matches `pow(0, m-2, m)` for non-invertible elements
+        if a % m == 0:
+            return gmpy2.mpz(0)
+        return gmpy2.invert(a, m)
+
+    @staticmethod
+    def sqrt(a, m):
+        return square_root_mod_prime(gmpy2.mpz(a), gmpy2.mpz(m))
+
+
+BACKENDS = {'python': PythonBackend}
+if gmpy2 is not None:
+    BACKENDS['gmpy2'] = Gmpy2Backend
+
+# Integer types which may be stored in field elements
+NATIVE_INT_TYPES = tuple(_.native for _ in BACKENDS.values() if _.native is not int)
+
+_backend = PythonBackend
+
+
+def available_backends():
+    return sorted(BACKENDS.keys())
+
+
+def get_backend():
+    return _backend
+
+
+def set_backend(name):
+    """
+    Select the arithmetic backend, `auto` prefers gmpy2 when it is installed
+    """
+    global _backend
+    if name == 'auto':
+        name = 'gmpy2' if 'gmpy2' in BACKENDS else 'python'
+    try:
+        _backend = BACKENDS[name]
+    except KeyError:
+        raise ValueError("Unknown or unavailable arithmetic backend: %r" % (name,))
+    return _backend
+
+
+def native(n):
+    """
+    Convert an integer to the representation used by the current backend
+    """
+    return _backend.native(n)
+
+
+set_backend(os.environ.get('ETHSNARKS_BACKEND', 'auto'))
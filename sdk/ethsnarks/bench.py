@@ -0,0 +1,211 @@
+"""
+Throughput benchmarks for the hashing and signature primitives
+
+Usage:
+
+    python -m sdk.ethsnarks.bench <command> [options]
+"""
+
+import sys
+import time
+import argparse
+
+from .field import SNARK_SCALAR_FIELD
+
+
+def _measure(func, count):
+    """
+    Returns the rate, in operations per second, of `func` which performs `count` operations
+    """
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    return count / elapsed
+
+
+def _report(name, rate, baseline=None):
+    line = '%-32s %12.1f ops/s' % (name, rate)
+    if baseline is not None:
+        line += '  (%.2fx)' % (rate / baseline,)
+    print(line)
+
+
+def bench_poseidon_batch(args):
+    from .poseidon import poseidon, poseidon_params, poseidon_batch, poseidon_compile
+    from .poseidon import poseidon_optimized_params
+
+    params = poseidon_params(SNARK_SCALAR_FIELD, args.width, 6, 53, b'poseidon', 5, security_target=128)
+    inputs = [[(i * params.t + j) % SNARK_SCALAR_FIELD for j in range(params.t - 1)]
+              for i in range(args.count)]
+
+    # Precomputation is per-process and shouldn't be counted
+    poseidon_optimized_params(params)
+    poseidon_compile(params)
+
+    print('# poseidon t=%d, %d messages' % (params.t, args.count))
+    baseline = _measure(lambda: [poseidon(_, params, engine='reference') for _ in inputs], args.count)
+    _report('poseidon (reference)', baseline)
+    _report('poseidon (optimized)', _measure(lambda: [poseidon(_, params, engine='optimized') for _ in inputs], args.count), baseline)
+    _report('poseidon (codegen)', _measure(lambda: [poseidon(_, params, engine='codegen') for _ in inputs], args.count), baseline)
+    _report('poseidon_batch', _measure(lambda: poseidon_batch(inputs, params), args.count), baseline)
+    if args.processes > 1:
+        _report('poseidon_batch (%d processes)' % (args.processes,),
+                _measure(lambda: poseidon_batch(inputs, params, processes=args.processes), args.count), baseline)
+
+
+def bench_mimc_batch(args):
+    from .mimc import mimc, mimc_hash, mimc_batch, mimc_hash_batch, mimc_round_constants
+
+    xs = [(i * 7919) % SNARK_SCALAR_FIELD for i in range(args.count)]
+    ks = [(i * 104729 + 1) % SNARK_SCALAR_FIELD for i in range(args.count)]
+    pairs = list(zip(xs, ks))
+    mimc_round_constants()
+
+    print('# mimc, %d inputs' % (args.count,))
+    baseline = _measure(lambda: [mimc(x, k) for x, k in pairs], args.count)
+    _report('mimc', baseline)
+    _report('mimc_batch', _measure(lambda: mimc_batch(xs, ks), args.count), baseline)
+    hash_baseline = _measure(lambda: [mimc_hash(_) for _ in pairs], args.count)
+    _report('mimc_hash (2 elements)', hash_baseline)
+    _report('mimc_hash_batch (2 elements)', _measure(lambda: mimc_hash_batch(pairs), args.count), hash_baseline)
+    if args.processes > 1:
+        _report('mimc_hash_batch (%d processes)' % (args.processes,),
+                _measure(lambda: mimc_hash_batch(pairs, processes=args.processes), args.count), hash_baseline)
+
+
+def bench_backends(args):
+    from .backend import available_backends, get_backend, set_backend
+    from .eddsa import PoseidonEdDSA
+    from .field import FQ
+    from .poseidon import poseidon, poseidon_params
+
+    params = poseidon_params(SNARK_SCALAR_FIELD, args.width, 6, 53, b'poseidon', 5, security_target=128)
+    messages = [[(i * params.t + j) % SNARK_SCALAR_FIELD for j in range(params.t - 1)]
+                for i in range(args.count)]
+    key = FQ(0x623167b48a61c02c546fef1bb0d810f4c0d14802b7669ef5b9de9af83212de)
+    n_sigs = max(1, args.count // 100)
+
+    previous = get_backend()
+    outputs = dict()
+    try:
+        for name in available_backends():
+            set_backend(name)
+            print('# backend', name)
+            hashes = []
+            _report('poseidon t=%d' % (params.t,),
+                    _measure(lambda: hashes.extend(poseidon(_, params, engine='reference') for _ in messages), args.count))
+            signed = []
+            _report('PoseidonEdDSA.sign',
+                    _measure(lambda: signed.extend(PoseidonEdDSA.sign(h, key) for h in hashes[:n_sigs]), n_sigs))
+            verified = []
+            _report('PoseidonEdDSA.verify',
+                    _measure(lambda: verified.extend(PoseidonEdDSA.verify(*_) for _ in signed), n_sigs))
+            outputs[name] = (hashes, [str(_) for _ in signed], verified)
+    finally:
+        set_backend(previous.name)
+
+    identical = len(set(repr(_) for _ in outputs.values())) == 1
+    print('# outputs identical across backends:', identical)
+    if not identical:
+        return 1
+
+
+def bench_eddsa(args):
+    from .eddsa import PoseidonEdDSA, EdDSASigner
+    from .field import FQ
+    from .jubjub import AbstractCurveOps, Point
+
+    key = FQ(0x623167b48a61c02c546fef1bb0d810f4c0d14802b7669ef5b9de9af83212de)
+    messages = list(range(1, max(2, args.count // 100) + 1))
+
+    def run():
+        signed = []
+        sign_rate = _measure(lambda: signed.extend(PoseidonEdDSA.sign(_, key) for _ in messages), len(messages))
+        verify_rate = _measure(lambda: [PoseidonEdDSA.verify(*_) for _ in signed], len(messages))
+        assert all(PoseidonEdDSA.verify(*_) for _ in signed)
+        return sign_rate, verify_rate, [str(_) for _ in signed]
+
+    # Baseline is the generic double-and-add on affine points
+    point_mult = Point.mult
+    Point.mult = AbstractCurveOps.mult
+    try:
+        base_sign, _, base_signed = run()
+    finally:
+        Point.mult = point_mult
+    sign_rate, verify_rate, signed = run()
+
+    print('# PoseidonEdDSA, %d messages' % (len(messages),))
+    _report('sign (affine double-and-add)', base_sign)
+    _report('sign', sign_rate, base_sign)
+    # Verification uses multi_scalar_mult, which the baseline doesn't replace
+    _report('verify', verify_rate)
+    print('# signatures identical:', signed == base_signed)
+
+    signer = EdDSASigner(key, PoseidonEdDSA)
+    _report('EdDSASigner.sign_many', _measure(lambda: signer.sign_many(messages), len(messages)), sign_rate)
+
+
+def bench_msm(args):
+    from .eddsa import PoseidonEdDSA
+    from .field import FQ
+    from .jubjub import Point, multi_scalar_mult
+
+    key = FQ(0x623167b48a61c02c546fef1bb0d810f4c0d14802b7669ef5b9de9af83212de)
+    signed = [PoseidonEdDSA.sign(_, key) for _ in range(1, max(2, args.count // 100) + 1)]
+
+    def verify_separate(A, sig, msg):
+        # Previous verification, two independent multiplications
+        R, S = sig
+        h = PoseidonEdDSA.hash_public(R, A, PoseidonEdDSA.prehash_message(msg))
+        return PoseidonEdDSA.B() * S == R + (A * h)
+
+    print('# PoseidonEdDSA.verify, %d signatures' % (len(signed),))
+    baseline = _measure(lambda: [verify_separate(*_) for _ in signed], len(signed))
+    _report('verify (separate mults)', baseline)
+    _report('verify (multi-scalar)', _measure(lambda: [PoseidonEdDSA.verify(*_) for _ in signed], len(signed)), baseline)
+
+    points = [Point.from_hash(b'%d' % (i,)) for i in range(64)]
+    scalars = [int(sig.s) for _, sig, _ in signed] * (64 // len(signed) + 1)
+    for k in (2, 8, 64):
+        _report('%d independent mults' % (k,), _measure(lambda: [P * s for P, s in zip(points[:k], scalars)], 1))
+        _report('multi_scalar_mult k=%d' % (k,), _measure(lambda: multi_scalar_mult(points[:k], scalars[:k]), 1))
+
+
+def bench_verify_batch(args):
+    from .eddsa import PoseidonEdDSA
+    from .field import FQ
+
+    key = FQ(0x623167b48a61c02c546fef1bb0d810f4c0d14802b7669ef5b9de9af83212de)
+    signed = [PoseidonEdDSA.sign(_, key) for _ in range(1, max(2, args.count // 10) + 1)]
+
+    print('# PoseidonEdDSA, %d signatures' % (len(signed),))
+    baseline = _measure(lambda: [PoseidonEdDSA.verify(*_) for _ in signed], len(signed))
+    _report('verify', baseline)
+    _report('verify_batch', _measure(lambda: PoseidonEdDSA.verify_batch(signed), len(signed)), baseline)
+    bad = list(signed)
+    bad[len(bad) // 2] = PoseidonEdDSA.sign(0, key)._replace(msg=1)
+    _report('verify_batch (one invalid)', _measure(lambda: PoseidonEdDSA.verify_batch(bad), len(bad)), baseline)
+
+
+COMMANDS = {
+    'eddsa': bench_eddsa,
+    'mimc-batch': bench_mimc_batch,
+    'msm': bench_msm,
+    'backends': bench_backends,
+    'poseidon-batch': bench_poseidon_batch,
+    'verify-batch': bench_verify_batch,
+}
+
+
+def _main(*argv):
+    parser = argparse.ArgumentParser('ethsnarks.bench')
+    parser.add_argument('-n', '--count', metavar='N', type=int, default=1000, help='number of operations')
+    parser.add_argument('-t', '--width', metavar='N', type=int, default=13, help='poseidon state width')
+    parser.add_argument('-p', '--processes', metavar='N', type=int, default=1, help='worker processes')
+    parser.add_argument('cmd', choices=sorted(COMMANDS.keys()))
+    args = parser.parse_args(argv or None)
+    return COMMANDS[args.cmd](args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main())
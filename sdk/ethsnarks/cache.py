@@ -0,0 +1,84 @@
+"""
+On-disk cache for derived constants and precomputed tables
+
+Round constants, MDS matrices and point tables are deterministic functions
+of their parameters, so they can be derived once and re-used by every
+subsequent process. Entries are stored as JSON files, one per name, inside
+a versioned directory:
+
+    $ETHSNARKS_CACHE_DIR/v1/<name>.json
+
+The default directory is `~/.cache/ethsnarks`. Setting the environment
+variable to an empty string, or calling `set_cache_dir(None)`, disables the
+on-disk cache entirely. Any I/O or decoding error is treated as a cache miss.
+"""
+
+import os
+import json
+import tempfile
+
+
+CACHE_VERSION = 1
+
+_cache_dir = os.environ.get('ETHSNARKS_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'ethsnarks'))
+
+
+def set_cache_dir(path):
+    """
+    Change the cache directory, `None` disables the on-disk cache
+
+    Returns the previous setting, so it can be restored afterwards
+    """
+    global _cache_dir
+    previous = _cache_dir
+    _cache_dir = path
+    return previous
+
+
+def cache_dir():
+    if not _cache_dir:
+        return None
+    return os.path.join(_cache_dir, 'v%d' % (CACHE_VERSION,))
+
+
+def cache_path(name):
+    directory = cache_dir()
+    if directory is None:
+        return None
+    return os.path.join(directory, name + '.json')
+
+
+def cache_load(name):
+    """
+    Return the cached object for `name`, or None if it isn't available
+    """
+    path = cache_path(name)
+    if path is None:
+        return None
+    try:
+        with open(path, 'r') as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def cache_store(name, obj):
+    """
+    Atomically write `obj` to the cache, failures are silently ignored
+    """
+    path = cache_path(name)
+    if path is None:
+        return False
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as handle:
+                json.dump(obj, handle)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError:
+        return False
+    return True
@@ -1,13 +1,15 @@
 import math
-import bitstring
 from collections import namedtuple
+from os import urandom
 from hashlib import sha512
 
 from .field import FQ, SNARK_SCALAR_FIELD
-from .jubjub import Point, JUBJUB_L, JUBJUB_Q, JUBJUB_E
-from .pedersen import pedersen_hash_bytes, pedersen_hash_bits
+from .jubjub import Point, JUBJUB_L, JUBJUB_Q, JUBJUB_E, multi_scalar_mult, in_prime_subgroup
+from .pedersen import pedersen_hash_windows, PedersenHasher
+from .serialize import ByteWriter, BitWriter
 from .poseidon import poseidon_params, poseidon
 from .mimc import mimc_hash
+from .lrucache import LRUCache
 
 
 """
@@ -43,6 +45,31 @@ For further information see: https://ed2519.cr.yp.to/eddsa-20150704.pdf
 P13N_EDDSA_VERIFY_M = 'EdDSA_Verify.M'
 P13N_EDDSA_VERIFY_RAM = 'EdDSA_Verify.RAM'
 
+# Decompressed and validated public keys, by their 32 byte compressed form
+PUBLIC_KEYS = LRUCache(4096)
+
+# Signatures which passed verification, disabled until given a capacity, e.g.
+#   VERIFIED_SIGNATURES.resize(10000)
+VERIFIED_SIGNATURES = LRUCache(0)
+
+
+def decompress_public_key(data):
+    """
+    Decompress a public key, which must be in the prime-order subgroup
+
+    The square root and subgroup check are only done the first time a key is
+    seen, later calls are answered from `PUBLIC_KEYS`.
+    """
+    # bytearray and memoryview aren't hashable
+    data = bytes(data)
+    A = PUBLIC_KEYS.get(data)
+    if A is None:
+        A = Point.decompress(data)
+        if A == Point.infinity() or A * JUBJUB_L != Point.infinity():
+            raise ValueError("Public key is not in the prime-order subgroup")
+        PUBLIC_KEYS.put(data, A)
+    return A
+
 
 class Signature(object):
     __slots__ = ('R', 's')
@@ -66,47 +93,11 @@ class SignedMessage(namedtuple('_SignedMessage', ('A', 'sig', 'msg'))):
 class _SignatureScheme(object):
     @classmethod
     def to_bytes(cls, *args):
-        # TODO: move to ethsnarks.utils ?
-        result = b''
-        for M in args:
-            if isinstance(M, Point):
-                result += M.x.to_bytes('little')
-                result += M.y.to_bytes('little')
-            elif isinstance(M, FQ):
-                result += M.to_bytes('little')
-            elif isinstance(M, (list, tuple)):
-                # Note: (list,tuple) must go *below* other class types to avoid type confusion
-                result += b''.join(cls.to_bytes(_) for _ in M)
-            elif isinstance(M, int):
-                result += M.to_bytes(32, 'little')
-            elif isinstance(M, bitstring.BitArray):
-                result += M.tobytes()
-            elif isinstance(M, bytes):
-                result += M
-            else:
-                raise TypeError("Bad type for M: " + str(type(M)))
-        return result
+        return ByteWriter().write(*args).getvalue()
 
     @classmethod
     def to_bits(cls, *args):
-        # TODO: move to ethsnarks.utils ?
-        result = bitstring.BitArray()
-        for M in args:
-            if isinstance(M, Point):
-                result.append(M.x.bits())
-            elif isinstance(M, FQ):
-                result.append(M.bits())
-            elif isinstance(M, (list, tuple)):
-                # Note: (list,tuple) must go *below* other class types to avoid type confusion
-                for _ in cls.to_bits(M):
-                    result.append(_)
-            elif isinstance(M, bytes):
-                result.append(M)
-            elif isinstance(M, bitstring.BitArray):
-                result.append(M)
-            else:
-                raise TypeError("Bad type for M: " + str(type(M)))
-        return result
+        return BitWriter().write(*args).to_bitarray()
 
     @classmethod
     def prehash_message(cls, M):
@@ -143,9 +134,21 @@ class _SignatureScheme(object):
             (Implementation detail: To save time in the computation of `rB`, the signer
             can replace `r` with `r mod L` before computing `rB`.)
         """
+        return cls._hash_secret(cls._secret_prefix(k), *args)
+
+    @classmethod
+    def _secret_prefix(cls, k):
+        """
+        Hasher state after absorbing the key, which is shared by every `r` for that key
+        """
         assert isinstance(k, FQ)
-        data = b''.join(cls.to_bytes(_) for _ in (k,) + args)
-        return int.from_bytes(sha512(data).digest(), 'little') % JUBJUB_L
+        return sha512(cls.to_bytes(k))
+
+    @classmethod
+    def _hash_secret(cls, prefix, *args):
+        hasher = prefix.copy()
+        hasher.update(ByteWriter().write(*args).buffer)
+        return int.from_bytes(hasher.digest(), 'little') % JUBJUB_L
 
     @classmethod
     def B(cls):
@@ -159,18 +162,24 @@ class _SignatureScheme(object):
         return k, A
 
     @classmethod
-    def sign(cls, msg, key, B=None):
+    def check_key(cls, key):
         if not isinstance(key, FQ):
             raise TypeError("Invalid type for parameter k")
         # Strict parsing ensures key is in the prime-order group
         if key.n >= JUBJUB_L or key.n <= 0:
             raise RuntimeError("Strict parsing of k failed")
 
+    @classmethod
+    def sign(cls, msg, key, B=None):
+        cls.check_key(key)
         B = B or cls.B()
         A = B * key                       # A = kB
+        return cls._sign(msg, key, A, B, cls._secret_prefix(key))
 
+    @classmethod
+    def _sign(cls, msg, key, A, B, secret_prefix):
         M = cls.prehash_message(msg)
-        r = cls.hash_secret(key, M)       # r = H(k,M) mod L
+        r = cls._hash_secret(secret_prefix, M)  # r = H(k,M) mod L
         R = B * r                         # R = rB
 
         t = cls.hash_public(R, A, M)      # Bind the message to the nonce, public key and message
@@ -179,32 +188,145 @@ class _SignatureScheme(object):
         return SignedMessage(A, Signature(R, S), msg)
 
     @classmethod
-    def verify(cls, A, sig, msg, B=None):
-        if not isinstance(A, Point):
+    def _parse(cls, A, sig):
+        if isinstance(A, (bytes, bytearray, memoryview)):
+            A = decompress_public_key(A)
+        elif not isinstance(A, Point):
             A = Point(*A)
 
         if not isinstance(sig, Signature):
             sig = Signature(*sig)
 
         R, S = sig
-        B = B or cls.B()
-        lhs = B * S
+        return A, R, int(S)
 
+    @classmethod
+    def _challenge(cls, A, R, S, msg):
+        """
+        Returns `(A, R, S, h)` where `S·B == R + h·A` holds for a valid signature
+        """
         M = cls.prehash_message(msg)
-        rhs = R + (A * cls.hash_public(R, A, M))
-        return lhs == rhs
+        return A, R, S, cls.hash_public(R, A, M)
+
+    @classmethod
+    def _verified_key(cls, B, A, R, S, msg):
+        # Key for VERIFIED_SIGNATURES, or None if the cache is disabled or `msg` is unhashable
+        if not VERIFIED_SIGNATURES.capacity:
+            return None
+        key = (cls, int(B.x), int(B.y), int(A.x), int(A.y), int(R.x), int(R.y), S, msg)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    @classmethod
+    def verify(cls, A, sig, msg, B=None):
+        """
+        Verify a signed message, `A` may also be a compressed public key
+
+        Successful verifications are remembered in `VERIFIED_SIGNATURES`
+        when it has a non-zero capacity.
+        """
+        B = B or cls.B()
+        A, R, S = cls._parse(A, sig)
+        key = cls._verified_key(B, A, R, S, msg)
+        if key is not None and VERIFIED_SIGNATURES.get(key):
+            return True
+        result = cls._verify_challenge(B, *cls._challenge(A, R, S, msg))
+        if result and key is not None:
+            VERIFIED_SIGNATURES.put(key, True)
+        return result
+
+    @staticmethod
+    def _verify_challenge(B, A, R, S, h):
+        # S·B == R + h·A, checked as S·B - h·A - R == O in a single pass
+        return multi_scalar_mult([B, A, R], [S, -h, -1]).as_point() == Point.infinity()
+
+    @classmethod
+    def verify_batch(cls, items, B=None):
+        """
+        Verify many `(A, sig, msg)` items, returns a list of booleans
+
+        Rather than checking each signature on its own, the randomized aggregate
+
+            (sum z_i·S_i)·B - sum (z_i·h_i)·A_i - sum z_i·R_i == O
+
+        is checked with a single multi-scalar multiplication, where `z_i` are
+        random 128-bit values. If it doesn't hold the batch is bisected until
+        the invalid signatures are found, which are then checked individually.
+
+        The random combination only catches errors in the prime-order subgroup,
+        a small-order component added to `R` or `A` would cancel out with
+        probability up to 1/2. So only signatures where `B`, `A` and `R` are
+        all in the prime-order subgroup are aggregated, any others are checked
+        individually, and the results always match `verify()`.
+        """
+        B = B or cls.B()
+        results = []
+        keys = []
+        challenges = dict()
+        aggregate = in_prime_subgroup(B)
+        for i, (A, sig, msg) in enumerate(items):
+            A, R, S = cls._parse(A, sig)
+            key = cls._verified_key(B, A, R, S, msg)
+            keys.append(key)
+            results.append(key is not None and VERIFIED_SIGNATURES.get(key, False))
+            if results[-1]:
+                continue
+            challenge = cls._challenge(A, R, S, msg)
+            if aggregate and in_prime_subgroup(A) and in_prime_subgroup(R):
+                challenges[i] = challenge
+            else:
+                results[i] = cls._verify_challenge(B, *challenge)
+                if results[i] and key is not None:
+                    VERIFIED_SIGNATURES.put(key, True)
+
+        pending = [sorted(challenges)] if challenges else []
+        while pending:
+            indices = pending.pop()
+            if len(indices) == 1:
+                results[indices[0]] = cls._verify_challenge(B, *challenges[indices[0]])
+            elif cls._verify_aggregate(B, [challenges[_] for _ in indices]):
+                for i in indices:
+                    results[i] = True
+            else:
+                half = len(indices) // 2
+                pending += [indices[half:], indices[:half]]
+
+        # Only prime-order points are aggregated, so an accepted signature is
+        # one `verify()` accepts too, and may be cached for it
+        for i in challenges:
+            if results[i] and keys[i] is not None:
+                VERIFIED_SIGNATURES.put(keys[i], True)
+        return results
+
+    @classmethod
+    def _verify_aggregate(cls, B, challenges):
+        points = [B]
+        scalars = [0]
+        for A, R, S, h in challenges:
+            z = int.from_bytes(urandom(16), 'little')
+            scalars[0] += z * S
+            points += [A, R]
+            scalars += [-((z * h) % JUBJUB_E), -z]
+        # Every point on the curve has an order which divides JUBJUB_E
+        scalars[0] %= JUBJUB_E
+        return multi_scalar_mult(points, scalars).as_point() == Point.infinity()
 
 
 class PureEdDSA(_SignatureScheme):
     @classmethod
     def hash_public(cls, *args, p13n=P13N_EDDSA_VERIFY_RAM):
-        return pedersen_hash_bits(p13n, cls.to_bits(*args)).x.n
+        windows = BitWriter().write(*args).windows()
+        assert len(windows) > 0
+        return int(pedersen_hash_windows(p13n, windows).x)
 
 
 class EdDSA(PureEdDSA):
     @classmethod
     def prehash_message(cls, M, p13n=P13N_EDDSA_VERIFY_M):
-        return pedersen_hash_bytes(p13n, M)
+        return PedersenHasher(p13n, ByteWriter().write(M).buffer).digest()
 
 
 # Convert arguments to integers / scalar values
@@ -232,8 +354,40 @@ class MiMCEdDSA(_SignatureScheme):
         return mimc_hash(list(as_scalar(*args)), seed=p13n)
 
 class PoseidonEdDSA(_SignatureScheme):
+    _hash_params = None
+
+    @classmethod
+    def hash_params(cls):
+        if cls._hash_params is None:
+            cls._hash_params = poseidon_params(SNARK_SCALAR_FIELD, 6, 6, 52, b'poseidon', 5, security_target=128)
+        return cls._hash_params
+
     @classmethod
     def hash_public(cls, *args):
-        PoseidonHashParams = poseidon_params(SNARK_SCALAR_FIELD, 6, 6, 52, b'poseidon', 5, security_target=128)
         inputMsg = list(as_scalar(*args))
-        return poseidon(inputMsg, PoseidonHashParams)
\ No newline at end of file
+        return poseidon(inputMsg, cls.hash_params())
+
+
+class EdDSASigner(object):
+    """
+    Signs many messages with the same key
+
+    The public key `A = k*B` and the hash of the key which prefixes every
+    nonce are computed once, rather than on every call to `scheme.sign()`.
+    Signatures are identical to those from `scheme.sign()`.
+    """
+    __slots__ = ('scheme', 'key', 'B', 'A', '_secret_prefix')
+
+    def __init__(self, key, scheme=PoseidonEdDSA, B=None):
+        scheme.check_key(key)
+        self.scheme = scheme
+        self.key = key
+        self.B = B or scheme.B()
+        self.A = self.B * key
+        self._secret_prefix = scheme._secret_prefix(key)
+
+    def sign(self, msg):
+        return self.scheme._sign(msg, self.key, self.A, self.B, self._secret_prefix)
+
+    def sign_many(self, msgs):
+        return [self.sign(_) for _ in msgs]
\ No newline at end of file
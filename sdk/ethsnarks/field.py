@@ -28,11 +28,11 @@ import bitstring
 from math import ceil, log2
 from os import urandom
 from collections import defaultdict
-from .numbertheory import square_root_mod_prime
+from .backend import NATIVE_INT_TYPES, get_backend, native
 
 # python3 compatibility
 if sys.version_info.major > 2:
-    int_types = (int,)
+    int_types = (int,) + NATIVE_INT_TYPES
     long = int
 else:
     int_types = (int, long)  # noqa: F821
@@ -44,7 +44,14 @@ FR_ORDER = 218882428718392752222464057452572750886145117772685380736017252875875
 
 # A class for field elements in FQ. Wrap a number in this class,
 # and it becomes a field element.
+#
+# Instances use `__slots__` and arithmetic results are constructed with
+# `_fq()`, which skips the validation and modulus reduction done by the public
+# constructor, as the operands have already been checked. Counting of
+# operations only happens after `_reset_counts()` has been called.
 class FQ(object):
+    __slots__ = ('n', 'm')
+
     _COUNTS = None
 
     @classmethod
@@ -78,10 +85,10 @@ class FQ(object):
             if not isinstance(field_modulus, int_types):
                 raise ValueError("Invalid modulus type: " + str(type(field_modulus)))
             self.m = field_modulus
-            self.n = n % self.m
+            self.n = native(n) % self.m
 
     def __int__(self):
-        return self.n
+        return int(self.n)
 
     def __hash__(self):
         return hash((self.n, self.m))
@@ -96,14 +103,20 @@ class FQ(object):
         return other
 
     def __add__(self, other):
-        on = self._other_n(other)
-        self._count('add')
-        return FQ((self.n + on) % self.m, self.m)
+        if self._COUNTS is not None:
+            self._count('add')
+        m = self.m
+        if type(other) is FQ and other.m == m:
+            return _fq((self.n + other.n) % m, m)
+        return _fq((self.n + self._other_n(other)) % m, m)
 
     def __mul__(self, other):
-        on = self._other_n(other)
-        self._count('mul')
-        return FQ((self.n * on) % self.m, self.m)
+        if self._COUNTS is not None:
+            self._count('mul')
+        m = self.m
+        if type(other) is FQ and other.m == m:
+            return _fq((self.n * other.n) % m, m)
+        return _fq((self.n * self._other_n(other)) % m, m)
 
     def __rmul__(self, other):
         return self * other
@@ -115,44 +128,48 @@ class FQ(object):
         return self.exp(e)
 
     def __rsub__(self, other):
-        on = self._other_n(other)
-        self._count('sub')
-        return FQ((on - self.n) % self.m, self.m)
+        if self._COUNTS is not None:
+            self._count('sub')
+        return _fq((self._other_n(other) - self.n) % self.m, self.m)
 
     def __sub__(self, other):
-        on = self._other_n(other)
-        self._count('sub')
-        return FQ((self.n - on) % self.m, self.m)
+        if self._COUNTS is not None:
+            self._count('sub')
+        m = self.m
+        if type(other) is FQ and other.m == m:
+            return _fq((self.n - other.n) % m, m)
+        return _fq((self.n - self._other_n(other)) % m, m)
 
     def to_bytes(self, endian='big'):
-        nbits = ceil(log2(self.m))
-        nbits += 8 - (nbits % 8)
-        nbytes = nbits // 8
-        return self.n.to_bytes(nbytes, endian)
+        return int(self.n).to_bytes(field_nbytes(self.m), endian)
 
     def bits(self):
         # TODO: endian
-        nbits = ceil(log2(self.m))
+        nbits = field_nbits(self.m)
         bits = bin(self.n)[2:][::-1].ljust(nbits, '0')
         return bitstring.BitArray('0b' + bits)
 
     def inv(self):
-        self._count('inv')
-        return FQ(pow(self.n, self.m - 2, self.m), self.m)
+        if self._COUNTS is not None:
+            self._count('inv')
+        return _fq(get_backend().invert(self.n, self.m), self.m)
 
     def sqrt(self):
-        self._count('sqrt')
-        return FQ(square_root_mod_prime(self.n, self.m), self.m)
+        if self._COUNTS is not None:
+            self._count('sqrt')
+        return _fq(get_backend().sqrt(self.n, self.m), self.m)
 
     def exp(self, e):
         e = self._other_n(e)
-        self._count('exp')
-        return FQ(pow(self.n, e, self.m), self.m)
+        if self._COUNTS is not None:
+            self._count('exp')
+        return _fq(get_backend().powmod(self.n, e, self.m), self.m)
 
     def __div__(self, other):
         on = self._other_n(other)
-        self._count('inv')
-        return FQ((self.n * pow(on, self.m-2, self.m)) % self.m, self.m)
+        if self._COUNTS is not None:
+            self._count('inv')
+        return _fq((self.n * get_backend().invert(on, self.m)) % self.m, self.m)
 
     def __floordiv__(self, other):
         return self.__div__(other)
@@ -162,14 +179,17 @@ class FQ(object):
 
     def __rdiv__(self, other):
         on = self._other_n(other)
-        self._count('inv')
-        self._count('mul')
-        return FQ((pow(self.n, self.m-2, self.m) * on) % self.m, self.m)
+        if self._COUNTS is not None:
+            self._count('inv')
+            self._count('mul')
+        return _fq((get_backend().invert(self.n, self.m) * on) % self.m, self.m)
 
     def __rtruediv__(self, other):
         return self.__rdiv__(other)
 
     def __eq__(self, other):
+        if type(other) is FQ and other.m == self.m:
+            return self.n == other.n
         if other == 0.:
             other = 0
         # TODO: verify modulus matches other?
@@ -179,11 +199,48 @@ class FQ(object):
         return not self == other
 
     def __neg__(self):
-        self._count('sub')
-        return FQ(-self.n, self.m)
+        if self._COUNTS is not None:
+            self._count('sub')
+        return _fq((-self.n) % self.m, self.m)
 
     def __repr__(self):
-        return repr(self.n)
+        return repr(int(self.n))
+
+    @staticmethod
+    def batch_inv(elements):
+        """
+        Invert many elements at once using Montgomery's trick
+
+        The running products of the elements are inverted with a single
+        modular exponentiation, then unwound to recover each inverse,
+        costing 3(n-1) multiplications instead of n exponentiations.
+        As with `inv()`, the inverse of zero is zero.
+        """
+        elements = list(elements)
+        if not elements:
+            return []
+        m = elements[0].m
+        prefixes = []
+        acc = native(1)
+        for e in elements:
+            if e.m != m:
+                raise ValueError("Field modulus mismatch")
+            prefixes.append(acc)
+            if e.n != 0:
+                acc = (acc * e.n) % m
+        if FQ._COUNTS is not None:
+            FQ._count('inv')
+            FQ._COUNTS['mul'] += 3 * (len(elements) - 1)
+        acc_inv = get_backend().invert(acc, m)
+        result = [None] * len(elements)
+        for i in range(len(elements) - 1, -1, -1):
+            n = elements[i].n
+            if n == 0:
+                result[i] = _fq(n, m)
+                continue
+            result[i] = _fq((acc_inv * prefixes[i]) % m, m)
+            acc_inv = (acc_inv * n) % m
+        return result
 
     @classmethod
     def random(cls, modulus=SNARK_SCALAR_FIELD):
@@ -205,6 +262,49 @@ class FQ(object):
             modulus = modulus.m
         return FQ(0, modulus)
 
+
+_FIELD_WIDTHS = dict()
+
+
+def _field_widths(m):
+    widths = _FIELD_WIDTHS.get(m)
+    if widths is None:
+        nbits = ceil(log2(m))
+        # Note: always rounds up to the next whole byte, even when nbits is a multiple of 8
+        nbytes = (nbits + 8 - (nbits % 8)) // 8
+        widths = _FIELD_WIDTHS[m] = (nbits, nbytes)
+    return widths
+
+
+def field_nbits(m):
+    """
+    Number of bits in the encoding of elements modulo `m`, as used by `FQ.bits()`
+    """
+    return _field_widths(m)[0]
+
+
+def field_nbytes(m):
+    """
+    Number of bytes in the encoding of elements modulo `m`, as used by `FQ.to_bytes()`
+    """
+    return _field_widths(m)[1]
+
+
+_new_object = object.__new__
+
+
+def _fq(n, m):
+    """
+    Construct an `FQ` from a value already reduced modulo `m`, without validation
+    """
+    result = _new_object(FQ)
+    result.n = n
+    result.m = m
+    return result
+
+
 class FR(FQ):
+    __slots__ = ()
+
     def __init__(self, n, field_modulus=FR_ORDER):
         FQ.__init__(self, n, field_modulus)
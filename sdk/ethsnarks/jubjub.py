@@ -23,6 +23,7 @@ from collections import namedtuple
 
 from .field import FQ, SNARK_SCALAR_FIELD
 from .numbertheory import SquareRootError
+from .cache import cache_load, cache_store
 
 
 JUBJUB_Q = SNARK_SCALAR_FIELD
@@ -66,11 +67,30 @@ assert JUBJUB_A == (MONT_A+2)/MONT_B
 assert JUBJUB_D == (MONT_A-2)/MONT_B
 
 
+# Window size for w-NAF scalar multiplication of affine points
+MULT_WINDOW = 5
+
+# Coordinates of `Point.generator()`
+GENERATOR_X = 16540640123574156134436876038791482806971768689494387082833631921987005038935
+GENERATOR_Y = 20819045374670962167435360035096875258406992893633759881276124905556507972311
+
+
 def is_negative(v):
 	assert isinstance(v, FQ)
 	return v.n > (-v).n
 
 
+def scalar_value(scalar):
+	"""
+	Return the integer value of a scalar for point multiplication
+	"""
+	if isinstance(scalar, FQ):
+		if scalar.m not in [SNARK_SCALAR_FIELD, JUBJUB_E, JUBJUB_L]:
+			raise ValueError("Invalid field modulus")
+		scalar = scalar.n
+	return scalar
+
+
 class AbstractCurveOps(object):
 	def __neg__(self):
 		return self.neg()
@@ -126,11 +146,10 @@ class AbstractCurveOps(object):
 		return mult_naf_lut(self, scalar, window)
 
 	def mult(self, scalar):
-		if isinstance(scalar, FQ):
-			if scalar.m not in [SNARK_SCALAR_FIELD, JUBJUB_E, JUBJUB_L]:
-				raise ValueError("Invalid field modulus")
-			scalar = scalar.n
+		scalar = scalar_value(scalar)
 		p = self
+		if scalar < 0:
+			p, scalar = p.neg(), -scalar
 		a = self.infinity()
 		i = 0
 		while scalar != 0:
@@ -236,7 +255,7 @@ class Point(AbstractCurveOps, namedtuple('_Point', ('x', 'y'))):
 
 	def compress(self):
 		x = self.x
-		y = self.y.n
+		y = int(self.y)
 		return int.to_bytes(y | (is_negative(x) << 255), 32, "little")
 
 	@classmethod
@@ -278,6 +297,19 @@ class Point(AbstractCurveOps, namedtuple('_Point', ('x', 'y'))):
 	def as_point(self):
 		return self
 
+	def mult(self, scalar):
+		"""
+		Affine addition needs two field inversions, so the multiplication is
+		done in extended coordinates using windowed NAF and only the result is
+		projected back to affine coordinates.
+		"""
+		scalar = scalar_value(scalar)
+		if self.x.n == GENERATOR_X and self.y.n == GENERATOR_Y:
+			table = generator_table()
+			if table.supports(scalar):
+				return table.mult(scalar).as_point()
+		return mult_naf_lut(self.as_etec(), scalar, MULT_WINDOW).as_point()
+
 	def neg(self):
 		"""
 		Twisted Edwards Curves, BBJLP-2008, section 2 pg 2
@@ -286,9 +318,7 @@ class Point(AbstractCurveOps, namedtuple('_Point', ('x', 'y'))):
 
 	@classmethod
 	def generator(cls):
-		x = 16540640123574156134436876038791482806971768689494387082833631921987005038935
-		y = 20819045374670962167435360035096875258406992893633759881276124905556507972311
-		return Point(FQ(x), FQ(y))
+		return Point(FQ(GENERATOR_X), FQ(GENERATOR_Y))
 
 
 	def valid(self):
@@ -620,6 +650,321 @@ class EtecPoint(AbstractCurveOps, namedtuple('_EtecPoint', ('x', 'y', 't', 'z'))
 		return EtecPoint(e*f, g*h, e*h, f*g)
 
 
+def normalize_batch(points):
+	"""
+	Convert many points to affine coordinates at once
+
+	Projective and extended points need their Z coordinate inverted to be
+	projected back to (x, y), the inversions are shared with `FQ.batch_inv`
+	so converting n points costs one inversion instead of n.
+	"""
+	points = list(points)
+	projective = [p for p in points if isinstance(p, (ProjPoint, EtecPoint))]
+	for p in projective:
+		assert p.z != 0
+	inv_z = iter(FQ.batch_inv([p.z for p in projective]))
+	result = []
+	for p in points:
+		if isinstance(p, (ProjPoint, EtecPoint)):
+			z = next(inv_z)
+			result.append(Point(p.x * z, p.y * z))
+		else:
+			result.append(p.as_point())
+	return result
+
+
+def is_affine_sum(point, a, b):
+	"""
+	Check that `point == a + b` for affine `(x, y)` pairs of integers
+
+	The addition formulas are multiplied out, so no inversion is needed.
+	"""
+	q = JUBJUB_Q
+	(x, y), (x1, y1), (x2, y2) = point, a, b
+	k = JUBJUB_D * x1 * x2 * y1 * y2 % q
+	return (x * (1 + k) - x1 * y2 - y1 * x2) % q == 0 and \
+		   (y * (1 - k) - y1 * y2 + JUBJUB_A * x1 * x2) % q == 0
+
+
+def affine_add(a, b):
+	"""
+	Add affine `(x, y)` pairs of integers, with a single inversion
+	"""
+	q = JUBJUB_Q
+	(x1, y1), (x2, y2) = a, b
+	k = JUBJUB_D * x1 * x2 * y1 * y2 % q
+	inv = pow((1 + k) * (1 - k) % q, q - 2, q)
+	return ((x1 * y2 + y1 * x2) * (1 - k) * inv % q,
+			(y1 * y2 - JUBJUB_A * x1 * x2) * (1 + k) * inv % q)
+
+
+class FixedBaseTable(object):
+	"""
+	Precomputed multiples of a fixed base point, for radix-2^w multiplication
+
+	Row `i` of the table holds `j * 2^(w*i) * base` for `j` in `1 .. 2^w - 1`,
+	so multiplying by a scalar of up to `nbits` bits is one table lookup and
+	one addition per `w`-bit digit, without any doublings.
+
+	Points are stored in extended coordinates normalized to `Z = 1`.
+	"""
+	def __init__(self, base, window=4, nbits=256, rows=None):
+		self.base = base.as_point()
+		self.window = window
+		self.nbits = nbits
+		self.n_rows = -(-nbits // window)
+		self.rows = self._build() if rows is None else rows
+
+	def _build(self):
+		per_row = (1 << self.window) - 1
+		rows = []
+		row_base = self.base.as_etec()
+		for _ in range(self.n_rows):
+			row = [row_base]
+			for _ in range(per_row - 1):
+				row.append(row[-1].add(row_base))
+			rows.append(row)
+			row_base = row[-1].add(row_base)
+		points = normalize_batch([p for row in rows for p in row])
+		return [[p.as_etec() for p in points[i:i+per_row]]
+				for i in range(0, len(points), per_row)]
+
+	def supports(self, scalar):
+		return abs(scalar).bit_length() <= self.nbits
+
+	def mult(self, scalar):
+		"""
+		Returns `scalar * base` as an `EtecPoint`
+		"""
+		scalar = scalar_value(scalar)
+		if not self.supports(scalar):
+			return mult_naf_lut(self.base.as_etec(), scalar, MULT_WINDOW)
+		if scalar < 0:
+			return self.mult(-scalar).neg()
+		mask = (1 << self.window) - 1
+		result = EtecPoint.infinity()
+		for row in self.rows:
+			if scalar == 0:
+				break
+			digit = scalar & mask
+			if digit:
+				result = result.add(row[digit - 1])
+			scalar >>= self.window
+		return result
+
+	def serialize(self):
+		return [[[hex(int(p.x)), hex(int(p.y))] for p in row] for row in self.rows]
+
+	@classmethod
+	def deserialize(cls, base, data, window=4, nbits=256):
+		"""
+		Reconstruct a table, raises ValueError if the data doesn't match the base point
+
+		Every entry is checked: each must equal the previous entry plus the
+		first entry of its row (for the first entry of a row, of the previous
+		row), starting from the base point. The additions are checked with
+		`is_affine_sum`, so no inversions are needed.
+		"""
+		base = base.as_point()
+		try:
+			rows = [[(int(x, 16), int(y, 16)) for x, y in row] for row in data]
+		except (TypeError, ValueError):
+			raise ValueError("Malformed fixed-base table")
+		n_rows = -(-nbits // window)
+		if len(rows) != n_rows or any(len(row) != (1 << window) - 1 for row in rows):
+			raise ValueError("Fixed-base table has wrong dimensions")
+		q = JUBJUB_Q
+		prev = step = None
+		for row in rows:
+			for i, (x, y) in enumerate(row):
+				if not (0 <= x < q and 0 <= y < q):
+					raise ValueError("Fixed-base table has invalid points")
+				if prev is None:
+					valid = x == base.x.n and y == base.y.n
+				else:
+					valid = is_affine_sum((x, y), prev, step)
+				if not valid:
+					raise ValueError("Fixed-base table doesn't match base point")
+				prev = (x, y)
+				if i == 0:
+					step = prev
+		return cls(base, window, nbits, [[EtecPoint(FQ(x), FQ(y), FQ(x * y % q), FQ(1)) for x, y in row] for row in rows])
+
+	@classmethod
+	def cached(cls, base, window=4, nbits=256):
+		"""
+		Load the table for `base` from the on-disk cache, building and storing it if necessary
+		"""
+		name = 'jubjub-fixed-base-%064x-w%d-b%d' % (int(base.as_point().x), window, nbits)
+		data = cache_load(name)
+		if data is not None:
+			try:
+				return cls.deserialize(base, data, window, nbits)
+			except ValueError:
+				pass
+		table = cls(base, window, nbits)
+		cache_store(name, table.serialize())
+		return table
+
+
+_GENERATOR_TABLE = None
+
+
+def generator_table():
+	"""
+	Fixed-base table for `Point.generator()`, built lazily once per process
+	"""
+	global _GENERATOR_TABLE
+	if _GENERATOR_TABLE is None:
+		_GENERATOR_TABLE = FixedBaseTable.cached(Point.generator())
+	return _GENERATOR_TABLE
+
+
+_SUBGROUP_CHECK = None
+
+
+def _subgroup_check_constants():
+	"""
+	Montgomery coordinates of an order-8 point T and of 2T, with the slopes of
+	the tangent lines at both, see `in_prime_subgroup`
+	"""
+	global _SUBGROUP_CHECK
+	if _SUBGROUP_CHECK is None:
+		q = JUBJUB_Q
+		T = Point.all_loworder_points()[3]
+		result = []
+		for P in (T, T.double()):
+			u = (1 + P.y.n) * pow(1 - P.y.n, q - 2, q) % q
+			v = u * pow(P.x.n, q - 2, q) % q
+			slope = (3*u*u + 2*MONT_A*u + 1) * pow(2*v, q - 2, q) % q
+			result += [u, v, slope]
+		_SUBGROUP_CHECK = tuple(result)
+	return _SUBGROUP_CHECK
+
+
+def in_prime_subgroup(point):
+	"""
+	Returns True if `point` has an order dividing `JUBJUB_L`
+
+	The group of points is cyclic of order `8*JUBJUB_L`, so this is the case
+	exactly when the point is a multiple of 8. Rather than multiplying by
+	`JUBJUB_L`, it's tested with the reduced Tate pairing of an order-8 point
+	T with the point, which is an 8th root of unity and is 1 only for the
+	multiples of 8. With 2T and 4T = (0, 0) in Montgomery form the Miller
+	function of T evaluated at P = (u, v) is
+
+		l_T(P)^4 * l_2T(P)^2 / ((u - u_2T)^4 * u)
+
+	where `l_X` is the tangent line at X. The divisors are moved into the
+	numerator, as up to 8th powers 1/a = a^7, and the Edwards to Montgomery
+	map `u = (1+y)/(1-y)`, `v = u/x` is folded in by multiplying through by
+	`D = (1-y)*x`, so the whole check is a single exponentiation.
+
+	The low-order points, where the line functions vanish, are handled first.
+	"""
+	point = point.as_point()
+	x, y = point.x.n, point.y.n
+	if x == 0 or y == 0:
+		# The points of order 1, 2 and 4
+		return x == 0 and y == 1
+	q = JUBJUB_Q
+	u_T, v_T, slope_T, u_2T, v_2T, slope_2T = _subgroup_check_constants()
+	D = (1 - y) * x % q
+	U = (1 + y) * x % q
+	V = 1 + y
+	l_T = (V - v_T*D - slope_T*(U - u_T*D)) % q
+	l_2T = (V - v_2T*D - slope_2T*(U - u_2T*D)) % q
+	if l_T == 0:
+		# One of the points of order 8, which lie on the tangent at T
+		return False
+	value = pow(l_T, 4, q) * pow(l_2T, 2, q) * pow(U - D, 4, q) * pow(U * D, 7, q)
+	return pow(value % q, (q - 1) // 8, q) == 1
+
+
+# Above this number of points `multi_scalar_mult` switches from Straus to Pippenger
+PIPPENGER_THRESHOLD = 32
+
+
+def multi_scalar_mult(points, scalars, width=MULT_WINDOW):
+	"""
+	Compute the sum of `scalar_i * point_i`, returned as an `EtecPoint`
+
+	All of the points share the same chain of doublings. For a small number of
+	points Straus' method is used with a w-NAF table per point, for many
+	points Pippenger's bucket method is used instead. Negative scalars are
+	handled by negating the point, and terms with the default generator as
+	their base use its fixed-base table.
+	"""
+	points = list(points)
+	scalars = list(scalars)
+	if len(points) != len(scalars):
+		raise ValueError("Number of points and scalars must match")
+	result = EtecPoint.infinity()
+	terms = []
+	for point, scalar in zip(points, scalars):
+		scalar = scalar_value(scalar)
+		if scalar < 0:
+			point, scalar = point.neg(), -scalar
+		if scalar == 0:
+			continue
+		if isinstance(point, Point) and point.x.n == GENERATOR_X and point.y.n == GENERATOR_Y:
+			table = generator_table()
+			if table.supports(scalar):
+				result = result.add(table.mult(scalar))
+				continue
+		if scalar == 1:
+			# No need for a w-NAF table, e.g. the `R` term when verifying signatures
+			result = result.add(point.as_etec())
+			continue
+		terms.append((point.as_etec(), int(scalar)))
+	if len(terms) > PIPPENGER_THRESHOLD:
+		return result.add(_msm_pippenger(terms))
+	elif terms:
+		return result.add(_msm_straus(terms, width))
+	return result
+
+
+def _msm_straus(terms, width):
+	tables = [naf_window(point, width) for point, _ in terms]
+	nafs = [wNAF(scalar, width) for _, scalar in terms]
+	length = max(len(_) for _ in nafs)
+	nafs = [[0] * (length - len(_)) + _ for _ in nafs]
+	result = None
+	for i in range(length):
+		if result is not None:
+			result = result.double()
+		for naf, table in zip(nafs, tables):
+			if naf[i]:
+				point = table[naf[i]]
+				result = point if result is None else result.add(point)
+	return result
+
+
+def _msm_pippenger(terms):
+	c = max(2, min(16, len(terms).bit_length() - 2))
+	mask = (1 << c) - 1
+	n_windows = -(-max(scalar.bit_length() for _, scalar in terms) // c)
+	result = EtecPoint.infinity()
+	for w in range(n_windows - 1, -1, -1):
+		for _ in range(c):
+			result = result.double()
+		buckets = [None] * mask
+		for point, scalar in terms:
+			digit = (scalar >> (w * c)) & mask
+			if digit:
+				bucket = buckets[digit - 1]
+				buckets[digit - 1] = point if bucket is None else bucket.add(point)
+		# Sum of digit * bucket[digit], using running sums from the top bucket down
+		running = EtecPoint.infinity()
+		window_sum = EtecPoint.infinity()
+		for bucket in reversed(buckets):
+			if bucket is not None:
+				running = running.add(bucket)
+			window_sum = window_sum.add(running)
+		result = result.add(window_sum)
+	return result
+
+
 def wNAF(k, width=2):
 	# windowed Non-Adjacent-Form
 	# https://bristolcrypto.blogspot.com/2015/04/52-things-number-26-describe-naf-scalar.html
@@ -665,6 +1010,9 @@ def naf_window(point, nbits):
 
 def mult_naf(point, scalar):
 	# Multiplication using NAF
+	scalar = scalar_value(scalar)
+	if scalar < 0:
+		point, scalar = point.neg(), -scalar
 	a = point.infinity()
 	for k_i in wNAF(scalar):
 		a = a.double()
@@ -677,6 +1025,9 @@ def mult_naf(point, scalar):
 
 def mult_naf_lut(point, scalar, width=2):
 	# Multipication using Windowed NAF, with an arbitrary sized window
+	scalar = scalar_value(scalar)
+	if scalar < 0:
+		point, scalar = point.neg(), -scalar
 	a = point.infinity()
 	w = naf_window(point, width)
 	for k_i in wNAF(scalar, width):
@@ -0,0 +1,80 @@
+"""
+Bounded least-recently-used cache with hit/miss counters
+
+Unlike `functools.lru_cache` the cache is an object in its own right, so it
+can be shared between functions, resized at runtime and inspected or cleared
+without access to the decorated function. A capacity of zero disables it.
+"""
+
+from threading import Lock
+from collections import OrderedDict, namedtuple
+
+
+CacheInfo = namedtuple('CacheInfo', ('hits', 'misses', 'capacity', 'size'))
+
+_MISSING = object()
+
+
+class LRUCache(object):
+    __slots__ = ('_capacity', '_data', '_lock', 'hits', 'misses')
+
+    def __init__(self, capacity=1024):
+        if capacity < 0:
+            raise ValueError("Capacity must not be negative")
+        self._capacity = capacity
+        self._data = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    def resize(self, capacity):
+        """
+        Change the capacity, evicting the least recently used entries if necessary
+        """
+        if capacity < 0:
+            raise ValueError("Capacity must not be negative")
+        with self._lock:
+            self._capacity = capacity
+            while len(self._data) > capacity:
+                self._data.popitem(last=False)
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            if self._capacity == 0:
+                return
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self._capacity:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove every entry and reset the counters
+        """
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def cache_info(self):
+        return CacheInfo(self.hits, self.misses, self._capacity, len(self._data))
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
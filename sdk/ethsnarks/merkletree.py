@@ -1,13 +1,24 @@
 # Copyright (c) 2018-2019 HarryR
 # License: LGPL-3.0+
 
+import os
+import sys
+import bisect
 import hashlib
 import math
+import struct
 from collections import namedtuple
 
-from .poseidon import poseidon, DefaultParams as poseidon_DefaultParams
-from .mimc import mimc_hash
+from concurrent.futures import ProcessPoolExecutor
+
+from .poseidon import poseidon, poseidon_batch, PoseidonParamsType, DefaultParams as poseidon_DefaultParams
+from .mimc import mimc_hash, mimc_hash_batch
 from .field import FQ, SNARK_SCALAR_FIELD
+from .mmaparray import MmapArray
+
+
+# Levels with fewer nodes than this are hashed in-process, even if a pool is requested
+MIN_PARALLEL_NODES = 256
 
 
 class MerkleProof(namedtuple('_MerkleProof', ('leaf', 'address', 'path', 'hasher', 'width'))):
@@ -46,6 +57,25 @@ class Abstract_MerkleHasher(object):
     def valid(self, item):
         return isinstance(item, int) and item > 0 and item < SNARK_SCALAR_FIELD
 
+    def hash_nodes(self, depth, nodes, processes=None):
+        """
+        Hash many nodes of the same level, returns `[hash_node(depth, *_) for _ in nodes]`
+        """
+        if processes is None or processes <= 1 or len(nodes) < MIN_PARALLEL_NODES:
+            return [self.hash_node(depth, *_) for _ in nodes]
+        chunk_size = -(-len(nodes) // (processes * 4))
+        jobs = [(self, depth, nodes[i:i+chunk_size]) for i in range(0, len(nodes), chunk_size)]
+        result = []
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            for chunk in executor.map(_hash_nodes_worker, jobs):
+                result.extend(chunk)
+        return result
+
+
+def _hash_nodes_worker(args):
+    hasher, depth, nodes = args
+    return hasher.hash_nodes(depth, nodes)
+
 
 # TODO: move to ethsnarks.mimc ?
 class MerkleHasher_MiMC(Abstract_MerkleHasher):
@@ -58,6 +88,9 @@ class MerkleHasher_MiMC(Abstract_MerkleHasher):
     def hash_node(self, depth, *args):
         return mimc_hash(args, self._IVs[depth])
 
+    def hash_nodes(self, depth, nodes, processes=None):
+        return mimc_hash_batch(nodes, self._IVs[depth], processes=processes)
+
 
 # TODO: move to ethsnarks.poseidon?
 class MerkleHasher_Poseidon(Abstract_MerkleHasher):
@@ -77,6 +110,17 @@ class MerkleHasher_Poseidon(Abstract_MerkleHasher):
     def hash_node(self, depth, *args):
         return poseidon(args, params=self._params)
 
+    def hash_nodes(self, depth, nodes, processes=None):
+        return poseidon_batch(nodes, self._params, processes=processes)
+
+    def __getstate__(self):
+        # Parameters are pickled as a plain tuple, the namedtuple isn't picklable
+        return (tuple(self._params), self._tree_depth)
+
+    def __setstate__(self, state):
+        self._params = PoseidonParamsType(*state[0])
+        self._tree_depth = state[1]
+
 
 DEFAULT_HASHER = MerkleHasher_MiMC
 
@@ -102,8 +146,25 @@ class MerkleTree(object):
 
     Each element of the proof supplies the index that the previous output will be inserted
     into the list of other elements in the hash to re-construct the root
+
+    In deferred mode `update` and `append` only record which leaves changed,
+    the internal nodes above them are recomputed by `commit`, which is called
+    automatically when the `root` or a `proof` is next read. Each dirty node is
+    hashed exactly once, however many of the leaves below it changed.
+
+    When `path` is given every level is stored in a memory-mapped file in
+    that directory (see `MmapArray`), instead of a list of Python ints. An
+    existing tree is reopened by passing the same `path`, `n_items` and
+    `width`, and the same hasher. Changes are written back by `flush` or
+    `close`.
+
+    With `leaf_index` enabled a dict from each leaf value to its position, or
+    a sorted list of positions for duplicate leaves, is maintained so that
+    `index`, `indices` and `in` don't scan every leaf. It can be switched on
+    or off at any time through the `leaf_index` property, and its memory use
+    is reported by `leaf_index_size`.
     """
-    def __init__(self, n_items, width=2, hasher=None):
+    def __init__(self, n_items, width=2, hasher=None, deferred=False, path=None, leaf_index=False):
         assert n_items >= width
         assert (n_items % width) == 0
         if hasher is None:
@@ -113,30 +174,197 @@ class MerkleTree(object):
         self._hasher = hasher(self._tree_depth, width)
         self._n_items = n_items
         self._cur = 0
-        self._leaves = [list() for _ in range(0, self._tree_depth + 1)]
+        if path is None:
+            self._leaves = [list() for _ in range(0, self._tree_depth + 1)]
+        else:
+            os.makedirs(path, exist_ok=True)
+            tag = struct.pack('<QQ', width, n_items)
+            self._leaves = [MmapArray(os.path.join(path, 'level-%02d.bin' % (_,)), tag)
+                            for _ in range(0, self._tree_depth + 1)]
+            self._cur = len(self._leaves[0])
+        self._deferred = deferred
+        self._dirty = set()
+        self._positions = None
+        self.leaf_index = leaf_index
 
     def __len__(self):
         return self._cur
 
-    def update(self, index, leaf):
+    @property
+    def deferred(self):
+        return self._deferred
+
+    @deferred.setter
+    def deferred(self, value):
+        if not value:
+            self.commit()
+        self._deferred = value
+
+    @property
+    def leaf_index(self):
+        return self._positions is not None
+
+    @leaf_index.setter
+    def leaf_index(self, value):
+        if not value:
+            self._positions = None
+        elif self._positions is None:
+            self._positions = dict()
+            for index, leaf in enumerate(self._leaves[0]):
+                self._index_add(leaf, index)
+
+    def leaf_index_size(self):
+        """
+        Approximate memory used by the leaf index in bytes, 0 if it's disabled
+        """
+        if self._positions is None:
+            return 0
+        total = sys.getsizeof(self._positions)
+        for leaf, positions in self._positions.items():
+            total += sys.getsizeof(leaf) + sys.getsizeof(positions)
+            if isinstance(positions, list):
+                total += sum(sys.getsizeof(_) for _ in positions)
+        return total
+
+    def _index_add(self, leaf, index):
+        positions = self._positions.get(leaf)
+        if positions is None:
+            self._positions[leaf] = index
+        elif isinstance(positions, list):
+            bisect.insort(positions, index)
+        else:
+            self._positions[leaf] = sorted([positions, index])
+
+    def _index_remove(self, leaf, index):
+        positions = self._positions[leaf]
+        if not isinstance(positions, list):
+            del self._positions[leaf]
+            return
+        positions.remove(index)
+        if len(positions) == 1:
+            self._positions[leaf] = positions[0]
+
+    def commit(self):
+        """
+        Recompute the internal nodes above every leaf changed since the last commit
+
+        Works level by level, hashing the distinct parents of the dirty nodes
+        of the level below, in ascending order so appended nodes land in place.
+        """
+        dirty = self._dirty
+        if not dirty:
+            return
+        self._dirty = set()
+        for depth in range(self._tree_depth):
+            dirty = sorted(set(_ // self._width for _ in dirty))
+            nodes = [self._make_node(depth, _ * self._width) for _ in dirty]
+            level = self._leaves[depth + 1]
+            for index, node in zip(dirty, self._hasher.hash_nodes(depth, nodes)):
+                if index == len(level):
+                    level.append(node)
+                else:
+                    level[index] = node
+
+    @classmethod
+    def from_leaves(cls, leaves, n_items=None, width=2, hasher=None, processes=None):
+        """
+        Build a tree from a sequence of leaves, identical to appending them one at a time
+
+        If `n_items` isn't given the capacity is the smallest power of `width`
+        which can hold every leaf.
+        """
+        leaves = list(leaves)
+        if n_items is None:
+            n_items = width
+            while n_items < len(leaves):
+                n_items *= width
+        tree = cls(n_items, width, hasher)
+        tree.extend(leaves, processes)
+        return tree
+
+    def extend(self, leaves, processes=None):
+        """
+        Append many leaves, hashing each affected node only once
+
+        Rather than updating the path to the root after every leaf, each
+        level is rebuilt bottom-up from the first changed node, which costs
+        about `n / (width - 1)` hashes for `n` leaves. Hashing within a level
+        can be split across `processes` worker processes.
+        """
+        leaves = [self._check_leaf(_) for _ in leaves]
+        if not leaves:
+            return
+        if self._cur + len(leaves) > self._n_items:
+            raise RuntimeError("Tree Full")
+        self.commit()
+        start = self._cur
+        if self._positions is not None:
+            for index, leaf in enumerate(leaves, start):
+                self._index_add(leaf, index)
+        self._leaves[0].extend(leaves)
+        self._cur += len(leaves)
+        for depth in range(self._tree_depth):
+            first = start // self._width
+            end = -(-len(self._leaves[depth]) // self._width)
+            nodes = [self._make_node(depth, _ * self._width) for _ in range(first, end)]
+            level = self._leaves[depth + 1]
+            del level[first:]
+            level.extend(self._hasher.hash_nodes(depth, nodes, processes))
+            start = first
+
+    def flush(self):
+        """
+        Commit any deferred updates and write back memory-mapped levels
+        """
+        self.commit()
+        for level in self._leaves:
+            if isinstance(level, MmapArray):
+                level.flush()
+
+    def close(self):
+        self.flush()
+        for level in self._leaves:
+            if isinstance(level, MmapArray):
+                level.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _check_leaf(self, leaf):
         if isinstance(leaf, FQ):
-            leaf = leaf.n
+            leaf = int(leaf)
         if not isinstance(leaf, int):
             raise TypeError("Invalid leaf")
         assert leaf >= 0 and leaf < SNARK_SCALAR_FIELD
+        return leaf
+
+    def update(self, index, leaf):
+        leaf = self._check_leaf(leaf)
         if (len(self._leaves[0]) - 1) < index:
             raise KeyError("Out of bounds")
+        if self._positions is not None:
+            self._index_remove(self._leaves[0][index], index)
+            self._index_add(leaf, index)
         self._leaves[0][index] = leaf
-        self._updateTree(index)
+        if self._deferred:
+            self._dirty.add(index)
+        else:
+            self._updateTree(index)
 
     def append(self, leaf):
         if self._cur >= (self._n_items):
             raise RuntimeError("Tree Full")
-        if isinstance(leaf, FQ):
-            leaf = leaf.n
-        assert leaf >= 0 and leaf < SNARK_SCALAR_FIELD
+        leaf = self._check_leaf(leaf)
+        if self._positions is not None:
+            self._index_add(leaf, self._cur)
         self._leaves[0].append(leaf)
-        self._updateTree()
+        if self._deferred:
+            self._dirty.add(self._cur)
+        else:
+            self._updateTree()
         self._cur += 1
         return self._cur - 1
 
@@ -151,11 +379,34 @@ class MerkleTree(object):
         self.update(key, value)
 
     def __contains__(self, key):
+        # Leaves are stored as ints, and `FQ` hashes differently to its value
+        if isinstance(key, FQ):
+            key = int(key)
+        if self._positions is not None:
+            return key in self._positions
         return key in self._leaves[0]
 
     def index(self, leaf):
+        if isinstance(leaf, FQ):
+            leaf = int(leaf)
+        if self._positions is not None:
+            positions = self._positions.get(leaf)
+            if positions is None:
+                raise ValueError("%r is not in tree" % (leaf,))
+            return positions[0] if isinstance(positions, list) else positions
         return self._leaves[0].index(leaf)
 
+    def indices(self, leaf):
+        """
+        Return the sorted positions of every occurrence of `leaf`
+        """
+        if isinstance(leaf, FQ):
+            leaf = int(leaf)
+        if self._positions is not None:
+            positions = self._positions.get(leaf, [])
+            return list(positions) if isinstance(positions, list) else [positions]
+        return [i for i, _ in enumerate(self._leaves[0]) if _ == leaf]
+
     def _make_node(self, depth, index):
         node_start = index - (index % self._width)
         return [self.leaf(depth, _) for _ in range(node_start, node_start + self._width)]
@@ -164,6 +415,7 @@ class MerkleTree(object):
         leaf = self[index]
         if index >= self._cur:
             raise RuntimeError("Proof for invalid item!")
+        self.commit()
         address_bits = list()
         merkle_proof = list()
         for depth in range(self._tree_depth):
@@ -197,4 +449,103 @@ class MerkleTree(object):
     def root(self):
         if self._cur == 0:
             return None
+        self.commit()
         return self._leaves[self._tree_depth][0]
+
+
+class SparseMerkleTree(object):
+    """
+    Merkle tree of fixed depth where most leaves are empty
+
+    Only nodes which differ from the default (empty) value of their level are
+    stored, in a dict keyed by `(depth, index)`. The default of each level is
+    computed once, level 0 being `default_leaf` and every level above the hash
+    of `width` defaults from the level below, so the capacity of the tree
+    (`width ** depth`) has no effect on memory use or on the cost of updates
+    and proofs, which are O(depth).
+
+    Proofs are `MerkleProof` instances and are verified the same way as those
+    from `MerkleTree`.
+    """
+    def __init__(self, depth, width=2, hasher=None, default_leaf=0):
+        assert depth > 0
+        assert width > 1
+        if hasher is None:
+            hasher = DEFAULT_HASHER
+        self._width = width
+        self._tree_depth = depth
+        self._hasher = hasher(depth, width)
+        self._nodes = dict()
+        self._defaults = [default_leaf]
+        for level in range(depth):
+            self._defaults.append(self._hasher.hash_node(level, *([self._defaults[-1]] * width)))
+
+    @property
+    def capacity(self):
+        return self._width ** self._tree_depth
+
+    def __len__(self):
+        """
+        Number of leaves which aren't the default value
+        """
+        return sum(1 for depth, _ in self._nodes if depth == 0)
+
+    def default(self, depth):
+        return self._defaults[depth]
+
+    def node(self, depth, index):
+        return self._nodes.get((depth, index), self._defaults[depth])
+
+    def _check_index(self, index):
+        if not isinstance(index, int):
+            raise TypeError("Invalid key")
+        if index < 0 or index >= self.capacity:
+            raise KeyError("Out of bounds")
+
+    def __getitem__(self, index):
+        self._check_index(index)
+        return self.node(0, index)
+
+    def __setitem__(self, index, leaf):
+        self.update(index, leaf)
+
+    def _set_node(self, depth, index, value):
+        if value == self._defaults[depth]:
+            self._nodes.pop((depth, index), None)
+        else:
+            self._nodes[(depth, index)] = value
+
+    def _siblings(self, depth, index):
+        node_start = index - (index % self._width)
+        return [self.node(depth, _) for _ in range(node_start, node_start + self._width)]
+
+    def update(self, index, leaf):
+        if isinstance(leaf, FQ):
+            leaf = int(leaf)
+        if not isinstance(leaf, int):
+            raise TypeError("Invalid leaf")
+        assert leaf >= 0 and leaf < SNARK_SCALAR_FIELD
+        self._check_index(index)
+        self._set_node(0, index, leaf)
+        for depth in range(self._tree_depth):
+            node = self._hasher.hash_node(depth, *self._siblings(depth, index))
+            index = index // self._width
+            self._set_node(depth + 1, index, node)
+
+    def proof(self, index):
+        leaf = self[index]
+        address_bits = list()
+        merkle_proof = list()
+        for depth in range(self._tree_depth):
+            proof_items = self._siblings(depth, index)
+            del proof_items[index % self._width]
+            if len(proof_items) == 1:
+                proof_items = proof_items[0]
+            address_bits.append(index % self._width)
+            merkle_proof.append(proof_items)
+            index = index // self._width
+        return MerkleProof(leaf, address_bits, merkle_proof, self._hasher, self._width)
+
+    @property
+    def root(self):
+        return self.node(self._tree_depth, 0)
@@ -1 +1,2 @@
-from .permutation import mimc, mimc_hash, mimc_hash_md
+from .permutation import mimc, mimc_hash, mimc_hash_md, mimc_round_constants
+from .batch import mimc_batch, mimc_hash_batch
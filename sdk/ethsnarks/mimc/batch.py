@@ -0,0 +1,110 @@
+"""
+Batched MiMC
+
+Each call to `mimc()` looks up its round constants and adds the key to each
+of them, in every one of the 91 rounds. When many independent values are
+encrypted, e.g. one level of a Merkle tree, the batch functions here derive
+the round keys `k + C[i]` once per distinct key and leave one addition and
+one `pow` per round for each lane.
+
+Running the rounds lane-major, rather than one round across all lanes at a
+time, avoids building an intermediate list per round and is the faster order
+in CPython.
+
+Large batches can optionally be split across a process pool.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+from .permutation import DEFAULT_SEED, DEFAULT_EXPONENT, DEFAULT_ROUNDS, mimc_round_constants
+from ..field import SNARK_SCALAR_FIELD
+from ..backend import native
+
+
+# Batches smaller than this are processed in-process, even if a pool is requested
+MIN_PARALLEL_BATCH = 256
+
+
+def _mimc_lanes(xs, ks, constants, p, e):
+    p = native(p)
+    constants = [native(_) for _ in constants]
+    # Round keys `k + C[i]`, shared by every lane using the same key
+    round_keys = dict()
+    result = []
+    for x, k in zip(xs, ks):
+        kc = round_keys.get(k)
+        if kc is None:
+            kc = round_keys[k] = [k + c_i for c_i in constants]
+        x = native(x)
+        for kc_i in kc:
+            x = pow(x + kc_i, e, p)
+        result.append(int((x + k) % p))
+    return result
+
+
+def _mimc_hash_lanes(messages, keys, constants, p, e):
+    keys = list(keys)
+    for i in range(max(len(_) for _ in messages)):
+        active = [j for j, m in enumerate(messages) if len(m) > i]
+        xs = [messages[j][i] for j in active]
+        rs = _mimc_lanes(xs, [keys[j] for j in active], constants, p, e)
+        for j, x, r in zip(active, xs, rs):
+            keys[j] = (keys[j] + x + r) % p
+    return keys
+
+
+def _mimc_batch_worker(args):
+    func, lanes, keys, constants, p, e = args
+    return func(lanes, keys, constants, p, e)
+
+
+def _run(func, lanes, keys, seed, p, e, R, processes, chunk_size):
+    if not lanes:
+        return []
+    constants = mimc_round_constants(seed, p, R)
+    if processes is None or processes <= 1 or len(lanes) < MIN_PARALLEL_BATCH:
+        return func(lanes, keys, constants, p, e)
+
+    if chunk_size is None:
+        chunk_size = max(MIN_PARALLEL_BATCH // 4, -(-len(lanes) // (processes * 4)))
+    jobs = [(func, lanes[i:i+chunk_size], keys[i:i+chunk_size], constants, p, e)
+            for i in range(0, len(lanes), chunk_size)]
+    result = []
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for chunk in executor.map(_mimc_batch_worker, jobs):
+            result.extend(chunk)
+    return result
+
+
+def _keys(ks, n):
+    if isinstance(ks, (list, tuple)):
+        if len(ks) != n:
+            raise ValueError("Number of keys must match the number of inputs")
+        return [int(_) for _ in ks]
+    return [int(ks)] * n
+
+
+def mimc_batch(xs, ks, seed=DEFAULT_SEED, p=SNARK_SCALAR_FIELD, e=DEFAULT_EXPONENT, R=DEFAULT_ROUNDS,
+               processes=None, chunk_size=None):
+    """
+    Returns `[mimc(x, k) for x, k in zip(xs, ks)]`
+
+    @param ks one key per input, or a single key shared by all inputs
+    @param processes number of worker processes, None runs in-process
+    """
+    assert R > 2
+    xs = [int(_) for _ in xs]
+    return _run(_mimc_lanes, xs, _keys(ks, len(xs)), seed, p, e, R, processes, chunk_size)
+
+
+def mimc_hash_batch(messages, k=0, seed=DEFAULT_SEED, p=SNARK_SCALAR_FIELD, e=DEFAULT_EXPONENT, R=DEFAULT_ROUNDS,
+                    processes=None, chunk_size=None):
+    """
+    Returns `[mimc_hash(m, k) for m in messages]`, messages may differ in length
+
+    @param k initial key for every message, or a list with one key per message
+    @param processes number of worker processes, None runs in-process
+    """
+    assert R > 2
+    messages = [[int(_) for _ in m] for m in messages]
+    return _run(_mimc_hash_lanes, messages, _keys(k, len(messages)), seed, p, e, R, processes, chunk_size)
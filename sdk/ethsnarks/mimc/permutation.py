@@ -1,8 +1,12 @@
 # Copyright (c) 2018 HarryR
 # License: LGPL-3.0+
 
+from hashlib import sha256
+
 from ..sha3 import keccak_256
 from ..field import SNARK_SCALAR_FIELD
+from ..backend import native
+from ..cache import cache_load, cache_store
 
 
 DEFAULT_EXPONENT = 7
@@ -51,6 +55,58 @@ def mimc_constants(seed=DEFAULT_SEED, p=SNARK_SCALAR_FIELD, R=DEFAULT_ROUNDS):
         yield seed
 
 
+_CONSTANTS = dict()
+
+
+def _constants_key(seed, p, R):
+    if isinstance(seed, str):
+        seed = seed.encode('ascii')
+    elif not isinstance(seed, bytes):
+        seed = int(seed)
+    return (seed, int(p), int(R))
+
+
+def _constants_cache_name(key):
+    return 'mimc-' + sha256(repr(key).encode('ascii')).hexdigest()[:32]
+
+
+def _load_constants(key):
+    """
+    Load previously derived round constants from disk
+    """
+    p, R = key[1:]
+    cached = cache_load(_constants_cache_name(key))
+    try:
+        if cached is None or cached['key'] != repr(key):
+            return None
+        constants = tuple(int(_, 16) for _ in cached['C'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if len(constants) != R or any(_ >= p for _ in constants):
+        return None
+    return constants
+
+
+def mimc_round_constants(seed=DEFAULT_SEED, p=SNARK_SCALAR_FIELD, R=DEFAULT_ROUNDS):
+    """
+    Round constants for `mimc`, reduced modulo `p`
+
+    These are memoized per (seed, p, R), and stored in the on-disk cache so
+    later processes don't need to derive them again.
+    """
+    key = _constants_key(seed, p, R)
+    constants = _CONSTANTS.get(key)
+    if constants is None:
+        constants = _load_constants(key)
+        if constants is None:
+            constants = tuple(_ % p for _ in mimc_constants(seed, p, R))
+            cache_store(_constants_cache_name(key), {
+                'key': repr(key),
+                'C': [hex(_) for _ in constants]})
+        _CONSTANTS[key] = constants
+    return constants
+
+
 def mimc(x, k, seed=DEFAULT_SEED, p=SNARK_SCALAR_FIELD, e=DEFAULT_EXPONENT, R=DEFAULT_ROUNDS):
     """
     The MiMC cipher: https://eprint.iacr.org/2016/492
@@ -84,10 +140,10 @@ def mimc(x, k, seed=DEFAULT_SEED, p=SNARK_SCALAR_FIELD, e=DEFAULT_EXPONENT, R=DE
     """
     assert R > 2
     # TODO: assert gcd(p-1, e) == 1
-    for c_i in list(mimc_constants(seed, p, R)):
-        a = (x + k + c_i) % p
-        x = (a ** e) % p
-    return (x + k) % p
+    x, k = native(x), native(k)
+    for c_i in mimc_round_constants(seed, p, R):
+        x = pow(x + k + c_i, e, p)
+    return int((x + k) % p)
 
 
 def mimc_hash(x, k=0, seed=DEFAULT_SEED, p=SNARK_SCALAR_FIELD, e=DEFAULT_EXPONENT, R=DEFAULT_ROUNDS):
@@ -146,6 +202,17 @@ def mimc_hash_md(x, k=0, seed=DEFAULT_SEED, p=SNARK_SCALAR_FIELD, e=DEFAULT_EXPO
     return k
 
 
+def _preload_constants(key):
+    constants = _load_constants(key)
+    if constants is not None:
+        _CONSTANTS[key] = constants
+
+
+# Constants for the default parameters are loaded at import if they're in the
+# on-disk cache, otherwise they're derived and stored on first use
+_preload_constants(_constants_key(DEFAULT_SEED, SNARK_SCALAR_FIELD, DEFAULT_ROUNDS))
+
+
 def _main():
     import argparse
     parser = argparse.ArgumentParser("MiMC")
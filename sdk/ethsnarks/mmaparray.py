@@ -0,0 +1,179 @@
+"""
+Memory-mapped array of 256-bit integers
+
+Each element is stored as a fixed-width 32-byte little-endian record in a
+file which is mapped into memory, so the data lives in the OS page cache
+rather than on the Python heap and reopening an existing array only maps the
+file instead of deserializing it. The file starts with a 32-byte header:
+
+    magic (8 bytes) | element count (8 bytes) | caller-supplied tag (16 bytes)
+
+The tag lets the owner of the array check that an existing file was created
+with compatible parameters. The file grows by doubling, and `flush` only
+writes back the records modified since the previous flush.
+"""
+
+import os
+import mmap
+import struct
+
+
+MMAP_ARRAY_MAGIC = b'EthSnkA1'
+
+RECORD_SIZE = 32
+
+_HEADER = struct.Struct('<8sQ16s')
+
+HEADER_SIZE = _HEADER.size
+
+_MIN_RECORDS = 64
+
+# Without it, Windows opens files in text mode
+_O_BINARY = getattr(os, 'O_BINARY', 0)
+
+
+class MmapArray(object):
+    """
+    Growable list-like sequence of non-negative integers below 2^256
+
+    Supports `len`, indexing, item assignment, `append`, `extend`, iteration
+    and deletion of a trailing slice (`del array[n:]`), which is how the
+    Merkle tree uses its levels.
+    """
+    def __init__(self, path, tag=b''):
+        if len(tag) > 16:
+            raise ValueError("Tag must be at most 16 bytes")
+        tag = tag.ljust(16, b'\0')
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | _O_BINARY, 0o644)
+        try:
+            size = os.fstat(self._fd).st_size
+            if size == 0:
+                size = HEADER_SIZE + _MIN_RECORDS * RECORD_SIZE
+                os.write(self._fd, _HEADER.pack(MMAP_ARRAY_MAGIC, 0, tag))
+                os.ftruncate(self._fd, size)
+            elif size < HEADER_SIZE:
+                raise ValueError("Truncated array file: %r" % (path,))
+            self._mm = mmap.mmap(self._fd, size)
+        except BaseException:
+            os.close(self._fd)
+            raise
+        magic, count, file_tag = _HEADER.unpack_from(self._mm, 0)
+        if magic != MMAP_ARRAY_MAGIC or file_tag != tag:
+            self._mm.close()
+            os.close(self._fd)
+            raise ValueError("Incompatible array file: %r" % (path,))
+        if HEADER_SIZE + count * RECORD_SIZE > size:
+            self._mm.close()
+            os.close(self._fd)
+            raise ValueError("Truncated array file: %r" % (path,))
+        self._tag = tag
+        self._count = count
+        self._flushed_count = count
+        self._view = memoryview(self._mm)
+        self._dirty_start = None
+        self._dirty_end = 0
+
+    def __len__(self):
+        return self._count
+
+    def _capacity(self):
+        return (len(self._mm) - HEADER_SIZE) // RECORD_SIZE
+
+    def _reserve(self, count):
+        capacity = self._capacity()
+        if count <= capacity:
+            return
+        # A file holding only the header has no room at all
+        capacity = max(capacity, _MIN_RECORDS)
+        while capacity < count:
+            capacity *= 2
+        # `mmap.resize` isn't available everywhere, and Windows can't extend a
+        # file which is mapped, so the file is grown between two mappings.
+        # Modified records are kept by the OS when the old mapping is closed.
+        size = HEADER_SIZE + capacity * RECORD_SIZE
+        self._view.release()
+        self._mm.close()
+        os.ftruncate(self._fd, size)
+        self._mm = mmap.mmap(self._fd, size)
+        self._view = memoryview(self._mm)
+
+    def _mark_dirty(self, start, end):
+        if self._dirty_start is None or start < self._dirty_start:
+            self._dirty_start = start
+        self._dirty_end = max(self._dirty_end, end)
+
+    def _offset(self, index):
+        if not isinstance(index, int):
+            raise TypeError("Invalid index")
+        if index < 0:
+            index += self._count
+        if index < 0 or index >= self._count:
+            raise IndexError("Index out of range")
+        return HEADER_SIZE + index * RECORD_SIZE
+
+    def __getitem__(self, index):
+        offset = self._offset(index)
+        return int.from_bytes(self._view[offset:offset + RECORD_SIZE], 'little')
+
+    def __setitem__(self, index, value):
+        offset = self._offset(index)
+        self._view[offset:offset + RECORD_SIZE] = value.to_bytes(RECORD_SIZE, 'little')
+        self._mark_dirty(offset, offset + RECORD_SIZE)
+
+    def __iter__(self):
+        view = self._view
+        for offset in range(HEADER_SIZE, HEADER_SIZE + self._count * RECORD_SIZE, RECORD_SIZE):
+            yield int.from_bytes(view[offset:offset + RECORD_SIZE], 'little')
+
+    def __delitem__(self, key):
+        if not isinstance(key, slice) or key.stop is not None or key.step is not None:
+            raise TypeError("Only a trailing slice can be deleted")
+        start = key.start or 0
+        if start < 0:
+            start = max(0, start + self._count)
+        self._count = min(start, self._count)
+
+    def append(self, value):
+        self.extend([value])
+
+    def extend(self, values):
+        data = b''.join([_.to_bytes(RECORD_SIZE, 'little') for _ in values])
+        if not data:
+            return
+        self._reserve(self._count + len(data) // RECORD_SIZE)
+        offset = HEADER_SIZE + self._count * RECORD_SIZE
+        self._view[offset:offset + len(data)] = data
+        self._mark_dirty(offset, offset + len(data))
+        self._count += len(data) // RECORD_SIZE
+
+    def index(self, value):
+        for i, item in enumerate(self):
+            if item == value:
+                return i
+        raise ValueError("%r is not in array" % (value,))
+
+    def __contains__(self, value):
+        return any(item == value for item in self)
+
+    def flush(self):
+        """
+        Write back the records modified since the last flush, then the header
+        """
+        if self._dirty_start is not None:
+            start = self._dirty_start - (self._dirty_start % mmap.ALLOCATIONGRANULARITY)
+            self._mm.flush(start, self._dirty_end - start)
+            self._dirty_start = None
+            self._dirty_end = 0
+        if self._count != self._flushed_count:
+            _HEADER.pack_into(self._mm, 0, MMAP_ARRAY_MAGIC, self._count, self._tag)
+            self._mm.flush(0, HEADER_SIZE)
+            self._flushed_count = self._count
+
+    def close(self):
+        if self._mm.closed:
+            return
+        self.flush()
+        self._view.release()
+        self._mm.close()
+        os.close(self._fd)
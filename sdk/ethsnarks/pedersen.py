@@ -2,48 +2,185 @@ import math
 import bitstring
 from math import floor, log2
 from struct import pack
+from hashlib import sha256
+from threading import Lock
 
-from .jubjub import Point, EtecPoint, JUBJUB_L, JUBJUB_C
+from .field import FQ
+from .jubjub import Point, EtecPoint, JUBJUB_L, JUBJUB_C, normalize_batch, is_affine_sum, affine_add
+from .cache import cache_load, cache_store, cache_path
+from .serialize import REV8
 
 
 MAX_SEGMENT_BITS = floor(log2(JUBJUB_L))
 MAX_SEGMENT_BYTES = MAX_SEGMENT_BITS // 8
 
 
+# 62 is defined in the ZCash Sapling Specification, Theorem 5.4.1
+# See: https://github.com/HarryR/ethsnarks/issues/121#issuecomment-499441289
+PEDERSEN_SEGMENT_WINDOWS = 62
+
+# Segments kept per personalization, each one is about 175 KiB of points
+PEDERSEN_MAX_SEGMENTS = 32
+
+_PEDERSEN_TABLES = dict()
+
+
+def _p13n_name(name):
+	if not isinstance(name, bytes):
+		if isinstance(name, str):
+			name = name.encode('ascii')
+		else:
+			raise TypeError("Name not bytes")
+	if len(name) > 28:
+		raise ValueError("Name too long")
+	return name
+
+
 def pedersen_hash_basepoint(name, i):
 	"""
 	Create a base point for use with the windowed pedersen hash function.
 	The name and sequence numbers are used a unique identifier.
 	Then HashToPoint is run on the name+seq to get the base point.
 	"""
-	if not isinstance(name, bytes):
-		if isinstance(name, str):
-			name = name.encode('ascii')
-		else:
-			raise TypeError("Name not bytes")
+	name = _p13n_name(name)
 	if i < 0 or i > 0xFFFF:
 		raise ValueError("Sequence number invalid")
-	if len(name) > 28:
-		raise ValueError("Name too long")
 	data = b"%-28s%04X" % (name, i)
 	return Point.from_hash(data).as_etec()
 
 
+class PedersenTable(object):
+	"""
+	Lookup tables for the windowed pedersen hash of one personalization
+
+	Row `i` of segment `k` holds the value of window `i` for each of its 8
+	possible values, `[1, 2, 3, 4, -1, -2, -3, -4] * 16^i * base_k`, so the
+	hash is one lookup and one addition per window. Segments are derived when
+	first needed, and `flush` persists them with the on-disk cache.
+
+	Only the first `max_segments` segments are kept, so memory doesn't grow
+	with the length of the messages hashed. Later segments are derived again
+	every time they are requested.
+	"""
+	def __init__(self, name, max_segments=PEDERSEN_MAX_SEGMENTS):
+		self.name = _p13n_name(name)
+		self.max_segments = max_segments
+		self.segments = []
+		self._lock = Lock()
+		self._load()
+		self._n_stored = len(self.segments)
+
+	def _cache_name(self):
+		return 'pedersen-' + sha256(self.name).hexdigest()[:32]
+
+	@staticmethod
+	def _make_rows(points):
+		# `points` are the positive multiples of every row, 4 per row
+		rows = []
+		for i in range(0, len(points), 4):
+			positive = [p.as_etec() for p in points[i:i+4]]
+			rows.append(tuple(positive + [p.neg() for p in positive]))
+		return rows
+
+	def _load(self):
+		data = cache_load(self._cache_name())
+		try:
+			if data is None or data['name'] != self.name.hex():
+				return
+			segments = [[Point(FQ(int(x, 16)), FQ(int(y, 16))) for x, y in segment]
+						for segment in data['segments'][:self.max_segments]]
+		except (KeyError, TypeError, ValueError):
+			return
+		for k, points in enumerate(segments):
+			if len(points) != 4 * PEDERSEN_SEGMENT_WINDOWS or not self._valid_segment(k, points):
+				return
+		self.segments = [self._make_rows(_) for _ in segments]
+
+	def _valid_segment(self, k, points):
+		"""
+		Check every point of a loaded segment against the one it's derived from
+		"""
+		base = pedersen_hash_basepoint(self.name, k)
+		points = [(p.x.n, p.y.n) for p in points]
+		if points[0] != (base.x.n, base.y.n):
+			return False
+		for i in range(0, len(points), 4):
+			one, two, three, four = points[i:i+4]
+			if not (is_affine_sum(two, one, one) and is_affine_sum(three, two, one) and is_affine_sum(four, two, two)):
+				return False
+			if i + 4 < len(points):
+				eight = affine_add(four, four)
+				if not is_affine_sum(points[i+4], eight, eight):
+					return False
+		return True
+
+	def _store(self):
+		if cache_path(self._cache_name()) is None:
+			return
+		cache_store(self._cache_name(), {
+			'name': self.name.hex(),
+			'segments': [[[hex(int(p.x)), hex(int(p.y))] for row in segment for p in row[:4]]
+						 for segment in self._affine_segments()]})
+
+	def _affine_segments(self):
+		return [[tuple(p.as_point() for p in row[:4]) for row in segment] for segment in self.segments]
+
+	def segment(self, k):
+		"""
+		Returns the rows for windows `62*k` to `62*k + 61`
+		"""
+		if k < len(self.segments):
+			return self.segments[k]
+		if k >= self.max_segments:
+			return self._build(k)
+		# Only one thread derives missing segments, the others wait for it
+		with self._lock:
+			while k >= len(self.segments):
+				self.segments.append(self._build(len(self.segments)))
+		return self.segments[k]
+
+	def flush(self):
+		"""
+		Persist the segments derived since the previous flush
+		"""
+		if len(self.segments) <= self._n_stored:
+			return
+		with self._lock:
+			n_segments = len(self.segments)
+			if n_segments > self._n_stored:
+				self._store()
+				self._n_stored = n_segments
+
+	def _build(self, k):
+		points = []
+		current = pedersen_hash_basepoint(self.name, k)
+		for _ in range(PEDERSEN_SEGMENT_WINDOWS):
+			double = current.double()
+			quad = double.double()
+			points += [current, double, double.add(current), quad]
+			current = quad.double().double()
+		return self._make_rows(normalize_batch(points))
+
+
+def pedersen_table(name):
+	"""
+	Returns the memoized `PedersenTable` for the personalization `name`
+	"""
+	name = _p13n_name(name)
+	table = _PEDERSEN_TABLES.get(name)
+	if table is None:
+		table = _PEDERSEN_TABLES[name] = PedersenTable(name)
+	return table
+
+
 def pedersen_hash_windows(name, windows):
-	# 62 is defined in the ZCash Sapling Specification, Theorem 5.4.1
-	# See: https://github.com/HarryR/ethsnarks/issues/121#issuecomment-499441289
-	n_windows = 62
+	table = pedersen_table(name)
 	result = EtecPoint.infinity()
 	for j, window in enumerate(windows):
-		if j % n_windows == 0:
-			current = pedersen_hash_basepoint(name, j//n_windows)
-		j = j % n_windows
-		if j != 0:
-			current = current.double().double().double().double()
-		segment = current * ((window & 0b11) + 1)
-		if window > 0b11:
-			segment = segment.neg()
-		result += segment
+		if j % PEDERSEN_SEGMENT_WINDOWS == 0:
+			rows = table.segment(j // PEDERSEN_SEGMENT_WINDOWS)
+		result = result.add(rows[j % PEDERSEN_SEGMENT_WINDOWS][window])
+	table.flush()
 	return result.as_point()
 
 
@@ -58,6 +195,80 @@ def pedersen_hash_bits(name, bits):
 	return pedersen_hash_windows(name, windows)
 
 
+class PedersenHasher(object):
+	"""
+	Incremental pedersen hash of a byte string
+
+	The bits of each byte are consumed most significant first, in 3-bit windows
+	whose first bit is the least significant. After reversing the bits of each
+	byte, every 3 bytes are exactly 8 windows of a little-endian integer, so the
+	windows are read directly from the input without building bit strings.
+	Only up to 2 bytes of input are buffered between calls to `update`.
+
+	The result is identical to `pedersen_hash_bytes(name, data)` for the
+	concatenation of all chunks.
+	"""
+	__slots__ = ('_table', '_result', '_n_windows', '_pending', '_rows')
+
+	def __init__(self, name, data=None):
+		self._table = pedersen_table(name)
+		self._result = EtecPoint.infinity()
+		self._n_windows = 0
+		self._pending = b''
+		self._rows = None
+		if data is not None:
+			self.update(data)
+
+	@property
+	def name(self):
+		return self._table.name
+
+	def _segment(self, k):
+		# Segments past the table's limit aren't kept by it, so the current
+		# one is held here rather than derived again for every chunk
+		if self._rows is None or self._rows[0] != k:
+			self._rows = (k, self._table.segment(k))
+		return self._rows[1]
+
+	def _add_windows(self, result, j, values):
+		# Add `(value, n_windows)` pairs to the result, starting at window `j`
+		rows = None
+		for value, count in values:
+			for _ in range(count):
+				i = j % PEDERSEN_SEGMENT_WINDOWS
+				if i == 0 or rows is None:
+					rows = self._segment(j // PEDERSEN_SEGMENT_WINDOWS)
+				result = result.add(rows[i][value & 0b111])
+				value >>= 3
+				j += 1
+		return result, j
+
+	def update(self, data):
+		"""
+		Absorb a chunk of bytes, returns `self`
+		"""
+		data = self._pending + bytes(data).translate(REV8)
+		end = len(data) - (len(data) % 3)
+		self._result, self._n_windows = self._add_windows(
+			self._result, self._n_windows,
+			((int.from_bytes(data[i:i+3], 'little'), 8) for i in range(0, end, 3)))
+		self._pending = data[end:]
+		return self
+
+	def digest(self):
+		"""
+		Returns the hash of all input so far, as a `Point`
+		"""
+		result, n_windows = self._result, self._n_windows
+		if self._pending:
+			# Trailing bits are padded with zeros to a whole window
+			count = -(-len(self._pending) * 8 // 3)
+			result, n_windows = self._add_windows(result, n_windows, [(int.from_bytes(self._pending, 'little'), count)])
+		assert n_windows > 0
+		self._table.flush()
+		return result.as_point()
+
+
 def pedersen_hash_bytes(name, data):
 	"""
 	Hashes a sequence of bits (the message) into a point.
@@ -68,10 +279,7 @@ def pedersen_hash_bytes(name, data):
 	assert isinstance(data, bytes)
 	assert len(data) > 0
 
-	# Decode bytes to octets of binary bits
-	bits = ''.join([bin(_)[2:].rjust(8, '0') for _ in data])
-
-	return pedersen_hash_bits(name, bits)
+	return PedersenHasher(name, data).digest()
 
 
 def pedersen_hash_scalars(name, *scalars):
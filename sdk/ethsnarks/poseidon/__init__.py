@@ -1,4 +1,8 @@
 from .permutation import *
+from .optimized import poseidon_optimized, poseidon_optimized_params
+from .batch import poseidon_batch
+from .codegen import poseidon_codegen, poseidon_compile, poseidon_write_module
+from .sponge import PoseidonSponge, poseidon_sponge
 
 if __name__ == "__main__":
     # TODO: implement 'constants' and 'matrix'
@@ -0,0 +1,105 @@
+"""
+Batched Poseidon hashing
+
+Hashing many independent messages one at a time spends most of its time
+allocating new state lists and walking the round constants for each message.
+`poseidon_batch` instead lays the states out column-wise, one list per state
+element holding that element for every message, so each round is a handful of
+list comprehensions shared by the whole batch.
+
+It uses the sparse partial-round representation from `poseidon_optimized`,
+and large batches can optionally be split across a process pool.
+"""
+
+from operator import mul
+from concurrent.futures import ProcessPoolExecutor
+
+from .permutation import DefaultParams, PoseidonParamsType
+from .optimized import poseidon_optimized_params
+from ..backend import native
+
+
+# Batches smaller than this are hashed in-process, even if a pool is requested
+MIN_PARALLEL_BATCH = 256
+
+
+def _mix_columns(columns, M, p):
+    lanes = list(zip(*columns))
+    return [[sum(map(mul, row, lane)) % p for lane in lanes] for row in M]
+
+
+def _full_round(columns, constants, e, p, M):
+    return _mix_columns([[pow(x + c, e, p) for x in column]
+                         for column, c in zip(columns, constants)], M, p)
+
+
+def _poseidon_batch_columns(inputs, params, chained):
+    opt = poseidon_optimized_params(params)
+    p, e, t, M = params.p, params.e, params.t, params.constants_M
+
+    columns = [[native(x[j]) if j < len(x) else native(0) for x in inputs] for j in range(t)]
+
+    for C_i in opt.first_C:
+        columns = _full_round(columns, [C_i] * t, e, p, M)
+
+    for k0, m00, m_row, w in opt.partial:
+        x0 = [pow(x + k0, e, p) for x in columns[0]]
+        rest = columns[1:]
+        columns = [[(m00 * a + sum(map(mul, m_row, lane))) % p
+                    for a, lane in zip(x0, zip(*rest))]]
+        columns += [[(w_i * a + b) % p for a, b in zip(x0, column)]
+                    for w_i, column in zip(w, rest)]
+
+    columns[0] = [pow(x + opt.last_partial_k0, e, p) for x in columns[0]]
+    columns = _mix_columns(columns, opt.last_partial_M, p)
+
+    columns = _full_round(columns, opt.carry_C, e, p, M)
+    for C_i in opt.second_C:
+        columns = _full_round(columns, [C_i] * t, e, p, M)
+
+    if chained:
+        return [[int(_) for _ in lane] for lane in zip(*columns)]
+    return [int(_) for _ in columns[0]]
+
+
+def _poseidon_batch_worker(args):
+    inputs, params, chained = args
+    # Parameters are sent as a plain tuple, the namedtuple isn't picklable
+    return _poseidon_batch_columns(inputs, PoseidonParamsType(*params), chained)
+
+
+def poseidon_batch(inputs, params=None, chained=False, processes=None, chunk_size=None):
+    """
+    Hash a sequence of messages, returns a list of results identical to
+    calling `poseidon()` on each message in turn.
+
+    @param inputs sequence of messages, each a list of field elements
+    @param processes number of worker processes, None hashes in-process
+    @param chunk_size number of messages per worker job
+    """
+    if params is None:
+        params = DefaultParams
+    assert isinstance(params, PoseidonParamsType)
+    inputs = list(inputs)
+    for x in inputs:
+        assert len(x) > 0
+        if not chained:
+            # Don't allow inputs to exceed the rate, unless in chained mode
+            assert len(x) < params.t
+        else:
+            assert len(x) <= params.t
+    if not inputs:
+        return []
+
+    if processes is None or processes <= 1 or len(inputs) < MIN_PARALLEL_BATCH:
+        return _poseidon_batch_columns(inputs, params, chained)
+
+    if chunk_size is None:
+        chunk_size = max(MIN_PARALLEL_BATCH // 4, -(-len(inputs) // (processes * 4)))
+    jobs = [(inputs[i:i+chunk_size], tuple(params), chained)
+            for i in range(0, len(inputs), chunk_size)]
+    result = []
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for chunk in executor.map(_poseidon_batch_worker, jobs):
+            result.extend(chunk)
+    return result
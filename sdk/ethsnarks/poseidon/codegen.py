@@ -0,0 +1,137 @@
+"""
+Generates specialized, straight-line Python code for a Poseidon parameter set
+
+Every round of the permutation is unrolled, state elements are held in local
+variables and all constants are inlined as literals. This removes the loop,
+branching and allocation overhead of the generic implementation, leaving only
+the big-integer arithmetic. The partial rounds use the sparse representation
+from `poseidon_optimized`.
+
+Compiled functions are cached per parameter set, and every function is checked
+against `poseidon_reference` before it is used.
+"""
+
+from .permutation import DefaultParams, PoseidonParamsType, POSEIDON_ENGINES, poseidon_reference
+from .optimized import poseidon_optimized_params
+
+
+_COMPILED = dict()
+
+
+def _state_vars(t):
+    return ['s%d' % (i,) for i in range(t)]
+
+
+def _mix_lines(M, p, t):
+    s = _state_vars(t)
+    rows = ['(%s) %% %d' % (' + '.join('%d*%s' % (m_ij, s_j) for m_ij, s_j in zip(row, s)), p)
+            for row in M]
+    return ['    %s = %s' % (', '.join(s), ', '.join(rows))]
+
+
+def _full_round_lines(constants, params):
+    p, e, t = params.p, params.e, params.t
+    s = _state_vars(t)
+    lines = ['    %s = %s' % (', '.join(s), ', '.join('pow(%s + %d, %d, %d)' % (s_j, c_j, e, p)
+                                                     for s_j, c_j in zip(s, constants)))]
+    return lines + _mix_lines(params.constants_M, p, t)
+
+
+def poseidon_codegen_source(params=None, name='poseidon_permutation'):
+    """
+    Returns the source of a function `name(state)` which applies the
+    permutation to a list of `t` elements, returning the new state as a list
+    """
+    if params is None:
+        params = DefaultParams
+    assert isinstance(params, PoseidonParamsType)
+    opt = poseidon_optimized_params(params)
+    p, e, t = params.p, params.e, params.t
+    s = _state_vars(t)
+
+    lines = ['def %s(state):' % (name,),
+             '    %s = state' % (', '.join(s),)]
+
+    for C_i in opt.first_C:
+        lines += _full_round_lines([C_i] * t, params)
+
+    for k0, m00, m_row, w in opt.partial:
+        lines.append('    s0 = pow(s0 + %d, %d, %d)' % (k0, e, p))
+        row = ' + '.join(['%d*s0' % (m00,)] + ['%d*%s' % (m_j, s_j) for m_j, s_j in zip(m_row, s[1:])])
+        rest = ['(%d*s0 + %s) %% %d' % (w_j, s_j, p) for w_j, s_j in zip(w, s[1:])]
+        lines.append('    %s = %s' % (', '.join(s), ', '.join(['(%s) %% %d' % (row, p)] + rest)))
+
+    lines.append('    s0 = pow(s0 + %d, %d, %d)' % (opt.last_partial_k0, e, p))
+    lines += _mix_lines(opt.last_partial_M, p, t)
+
+    lines += _full_round_lines(opt.carry_C, params)
+    for C_i in opt.second_C:
+        lines += _full_round_lines([C_i] * t, params)
+
+    lines.append('    return [%s]' % (', '.join(s),))
+    return '\n'.join(lines) + '\n'
+
+
+def _check_equivalence(func, params):
+    p, t = params.p, params.t
+    vectors = [[0] * t,
+               list(range(1, t + 1)),
+               [(p - 1 - (i * 0x9e3779b97f4a7c15)) % p for i in range(t)]]
+    for state in vectors:
+        if func(list(state)) != poseidon_reference(state, params, chained=True):
+            raise RuntimeError("Generated Poseidon code doesn't match the reference implementation")
+
+
+def poseidon_compile(params=None):
+    """
+    Returns the compiled permutation function for `params`, memoized per parameter set
+    """
+    if params is None:
+        params = DefaultParams
+    func = _COMPILED.get(params)
+    if func is None:
+        namespace = dict()
+        source = poseidon_codegen_source(params)
+        exec(compile(source, '<poseidon_t%d>' % (params.t,), 'exec'), namespace)
+        func = namespace['poseidon_permutation']
+        _check_equivalence(func, params)
+        _COMPILED[params] = func
+    return func
+
+
+def poseidon_write_module(path, params=None, name='poseidon_permutation'):
+    """
+    Write the generated function to an importable Python module
+    """
+    if params is None:
+        params = DefaultParams
+    source = poseidon_codegen_source(params, name)
+    namespace = dict()
+    exec(compile(source, path, 'exec'), namespace)
+    _check_equivalence(namespace[name], params)
+    with open(path, 'w') as handle:
+        handle.write('# Generated by ethsnarks.poseidon.codegen, do not edit\n')
+        handle.write('# p=%d t=%d nRoundsF=%d nRoundsP=%d seed=%r e=%d\n\n\n' % tuple(params[:6]))
+        handle.write(source)
+
+
+def poseidon_codegen(inputs, params=None, chained=False, trace=False):
+    """
+    Poseidon permutation using generated code, returns identical results to `poseidon()`
+    """
+    if params is None:
+        params = DefaultParams
+    assert isinstance(params, PoseidonParamsType)
+    assert len(inputs) > 0
+    if not chained:
+        # Don't allow inputs to exceed the rate, unless in chained mode
+        assert len(inputs) < params.t
+    state = [0] * params.t
+    state[:len(inputs)] = inputs
+    state = poseidon_compile(params)(state)
+    if chained:
+        return state
+    return state[0]
+
+
+POSEIDON_ENGINES['codegen'] = poseidon_codegen
@@ -0,0 +1,163 @@
+"""
+Optimized Poseidon permutation, using the sparse partial-round formulation
+
+iacr.org/2019/458 Appendix B "Efficient Implementation for Partial Rounds"
+
+During the partial rounds only `state[0]` passes through the S-box, the
+remaining elements are only affected by linear operations. This allows two
+transformations which don't change the output of the permutation:
+
+ 1. Round constants added to elements 1..t-1 pass through the S-box unchanged,
+    so they can be pushed forward through the mixing matrix into the next
+    round. After this only a single scalar constant remains per partial round,
+    and the accumulated vector is added at the start of the next full round.
+
+ 2. The mixing matrix can be factored as `M = M' · M''` where
+
+        M' = [ 1     0   ]      M'' = [ m00       m_row ]
+             [ 0  M_inner]            [ M_inner^-1 · m_col    I ]
+
+    As `M'` doesn't touch `state[0]` it commutes with the partial S-box layer,
+    and can be merged into the following round's matrix. Repeating this for
+    every partial round leaves each of them with the sparse `M''`, which needs
+    `2t - 1` multiplications instead of `t^2`, with one dense matrix left for
+    the last partial round.
+
+The output is bit-identical to `poseidon_reference` for every parameter set.
+"""
+
+from collections import namedtuple
+
+from .permutation import DefaultParams, PoseidonParamsType, POSEIDON_ENGINES, poseidon_mix
+from ..backend import native
+
+
+PoseidonOptimizedParams = namedtuple('_PoseidonOptimizedParams', (
+    'first_C',          # Scalar constants for the first half of full rounds
+    'partial',          # (k0, m00, m_row, w) for all but the last partial round
+    'last_partial_k0',  # Scalar constant for the last partial round
+    'last_partial_M',   # Dense matrix for the last partial round
+    'carry_C',          # Constant vector for the first round of the second half
+    'second_C'))        # Scalar constants for the remaining full rounds
+
+_OPTIMIZED_PARAMS = dict()
+
+
+def _matrix_inverse(M, p):
+    """
+    Invert a square matrix modulo the prime `p` using Gauss-Jordan elimination
+    """
+    n = len(M)
+    A = [list(row) + [int(i == j) for j in range(n)] for i, row in enumerate(M)]
+    for col in range(n):
+        pivot = next((r for r in range(col, n) if A[r][col] % p != 0), None)
+        if pivot is None:
+            raise ValueError("Matrix is singular")
+        A[col], A[pivot] = A[pivot], A[col]
+        inv = pow(A[col][col], p - 2, p)
+        A[col] = [(_ * inv) % p for _ in A[col]]
+        for r in range(n):
+            if r != col and A[r][col] != 0:
+                factor = A[r][col]
+                A[r] = [(a - factor * b) % p for a, b in zip(A[r], A[col])]
+    return [row[n:] for row in A]
+
+
+def _matrix_mul(A, B, p):
+    return [[sum(a * B[k][j] for k, a in enumerate(row)) % p for j in range(len(B[0]))]
+            for row in A]
+
+
+def poseidon_optimized_params(params=None):
+    """
+    Precompute the constant-folded and sparse-matrix representation of `params`
+
+    The result is memoized per parameter set.
+    """
+    if params is None:
+        params = DefaultParams
+    result = _OPTIMIZED_PARAMS.get(params)
+    if result is not None:
+        return result
+
+    p, t = params.p, params.t
+    M = [list(row) for row in params.constants_M]
+    half_F = params.nRoundsF // 2
+    constants_C = params.constants_C
+    partial_C = constants_C[half_F:half_F + params.nRoundsP]
+
+    # Push the constants for elements 1..t-1 of each partial round forward
+    carry = [0] * t
+    partial_k0 = []
+    for C_i in partial_C:
+        k = [(C_i + _) % p for _ in carry]
+        partial_k0.append(k[0])
+        carry = poseidon_mix([0] + k[1:], M, p)
+    carry_C = tuple((constants_C[half_F + params.nRoundsP] + _) % p for _ in carry)
+
+    # Factor each partial round matrix into a sparse matrix and a dense
+    # matrix which is merged into the following round.
+    partial = []
+    A = M
+    for k0 in partial_k0[:-1]:
+        A_inner = [row[1:] for row in A[1:]]
+        A_inner_inv = _matrix_inverse(A_inner, p)
+        m_col = [[row[0]] for row in A[1:]]
+        w = tuple(_[0] for _ in _matrix_mul(A_inner_inv, m_col, p))
+        partial.append((k0, A[0][0], tuple(A[0][1:]), w))
+        M_prime = [[1] + [0] * (t - 1)] + [[0] + row for row in A_inner]
+        A = _matrix_mul(M, M_prime, p)
+
+    result = PoseidonOptimizedParams(
+        tuple(constants_C[:half_F]),
+        tuple(partial),
+        partial_k0[-1],
+        tuple(tuple(row) for row in A),
+        carry_C,
+        tuple(constants_C[half_F + params.nRoundsP + 1:]))
+    _OPTIMIZED_PARAMS[params] = result
+    return result
+
+
+def poseidon_optimized(inputs, params=None, chained=False, trace=False):
+    """
+    Poseidon permutation using the sparse partial-round formulation
+
+    Accepts the same arguments as `poseidon()` and returns identical results.
+    """
+    if params is None:
+        params = DefaultParams
+    assert isinstance(params, PoseidonParamsType)
+    assert len(inputs) > 0
+    if not chained:
+        # Don't allow inputs to exceed the rate, unless in chained mode
+        assert len(inputs) < params.t
+    opt = poseidon_optimized_params(params)
+    p, e, M = params.p, params.e, params.constants_M
+
+    state = [0] * params.t
+    state[:len(inputs)] = inputs
+    state = [native(_) for _ in state]
+
+    for C_i in opt.first_C:
+        state = poseidon_mix([pow(_ + C_i, e, p) for _ in state], M, p)
+
+    for k0, m00, m_row, w in opt.partial:
+        x0 = pow(state[0] + k0, e, p)
+        rest = state[1:]
+        state = [(m00 * x0 + sum([a * b for a, b in zip(m_row, rest)])) % p]
+        state += [(x0 * w_i + s_i) % p for w_i, s_i in zip(w, rest)]
+
+    state[0] = pow(state[0] + opt.last_partial_k0, e, p)
+    state = poseidon_mix(state, opt.last_partial_M, p)
+
+    state = poseidon_mix([pow(a + b, e, p) for a, b in zip(state, opt.carry_C)], M, p)
+    for C_i in opt.second_C:
+        state = poseidon_mix([pow(_ + C_i, e, p) for _ in state], M, p)
+
+    if chained:
+        return [int(_) for _ in state]
+    return int(state[0])
+
+
+POSEIDON_ENGINES['optimized'] = poseidon_optimized
@@ -15,15 +15,46 @@ Other implementations:
 """
 
 from math import log2, floor
+from hashlib import sha256
 from collections import namedtuple
 from pyblake2 import blake2b
 from ..field import SNARK_SCALAR_FIELD
+from ..cache import cache_load, cache_store
+from ..backend import native
 
 
 PoseidonParamsType = namedtuple('_PoseidonParams', ('p', 't', 'nRoundsF', 'nRoundsP', 'seed', 'e', 'constants_C', 'constants_M'))
 
+# Process-wide registry of derived parameters, see `poseidon_params`
+_PARAMS_REGISTRY = dict()
+
+# Registry keys whose derived constants haven't been written to the on-disk cache
+_UNSTORED = set()
+
+
+def poseidon_params(p, t, nRoundsF, nRoundsP, seed, e, constants_C=None, constants_M=None, security_target=None, store=True):
+    """
+    Returns the parameters for a Poseidon instance
+
+    When the constants aren't supplied they are derived from the seed, this is
+    expensive so the result is memoized in a process-wide registry keyed by the
+    arguments, and the derived constants are persisted to the on-disk cache
+    so subsequent processes can skip the derivation.
+
+    With `store` false the cache is only read, derived constants are written
+    once the same parameters are requested again with `store` set.
+    """
+    derived = constants_C is None and constants_M is None
+    key = None
+    if derived:
+        key = (p, t, nRoundsF, nRoundsP, seed, e, security_target)
+        params = _PARAMS_REGISTRY.get(key)
+        if params is not None:
+            if store and key in _UNSTORED:
+                _UNSTORED.discard(key)
+                _store_constants(key, params)
+            return params
 
-def poseidon_params(p, t, nRoundsF, nRoundsP, seed, e, constants_C=None, constants_M=None, security_target=None):
     assert nRoundsF % 2 == 0 and nRoundsF > 0
     assert nRoundsP > 0
     assert t >= 2
@@ -74,10 +105,16 @@ def poseidon_params(p, t, nRoundsF, nRoundsP, seed, e, constants_C=None, constan
     # - Select R_F to 6 or rhigher
     # - Select R_P that minimizes tRF +RP such that no inequation (1),(3),(4),(5) is satisfied.
 
+    if derived:
+        constants_C, constants_M = _load_constants(key)
+        # Only constants which had to be derived are written back to the cache
+        derived = constants_C is None
     if constants_C is None:
         constants_C = list(poseidon_constants(p, seed + b'_constants', nRoundsF + nRoundsP))
     if constants_M is None:
         constants_M = poseidon_matrix(p, seed + b'_matrix_0000', t)
+    constants_C = tuple(constants_C)
+    constants_M = tuple(tuple(row) for row in constants_M)
 
     # iacr.org/2019/458 § 4.1 6 SNARKs Application via Poseidon-π
     # page 16 formula (8) and (9)
@@ -88,7 +125,53 @@ def poseidon_params(p, t, nRoundsF, nRoundsP, seed, e, constants_C=None, constan
         n_constraints *= 2
     #print('n_constraints', n_constraints)
 
-    return PoseidonParamsType(p, t, nRoundsF, nRoundsP, seed, e, constants_C, constants_M)
+    params = PoseidonParamsType(p, t, nRoundsF, nRoundsP, seed, e, constants_C, constants_M)
+    if key is not None:
+        _PARAMS_REGISTRY[key] = params
+    if derived:
+        if store:
+            _store_constants(key, params)
+        else:
+            _UNSTORED.add(key)
+    return params
+
+
+def _constants_cache_name(key):
+    return 'poseidon-' + sha256(repr(key).encode('ascii')).hexdigest()[:32]
+
+
+def _load_constants(key):
+    """
+    Load previously derived constants for the parameter set from disk
+    """
+    p, t, nRoundsF, nRoundsP = key[:4]
+    cached = cache_load(_constants_cache_name(key))
+    try:
+        if cached is None or cached['key'] != repr(key):
+            return None, None
+        constants_C = [int(_, 16) for _ in cached['C']]
+        constants_M = [[int(_, 16) for _ in row] for row in cached['M']]
+    except (KeyError, TypeError, ValueError):
+        return None, None
+    if len(constants_C) != (nRoundsF + nRoundsP) or len(constants_M) != t or any(len(row) != t for row in constants_M):
+        return None, None
+    if any(_ >= p for _ in constants_C) or any(_ >= p for row in constants_M for _ in row):
+        return None, None
+    return constants_C, constants_M
+
+
+def _store_constants(key, params):
+    cache_store(_constants_cache_name(key), {
+        'key': repr(key),
+        'C': [hex(_) for _ in params.constants_C],
+        'M': [[hex(_) for _ in row] for row in params.constants_M]})
+
+
+def poseidon_params_registry():
+    """
+    Returns a copy of the process-wide parameter registry
+    """
+    return dict(_PARAMS_REGISTRY)
 
 
 def H(arg):
@@ -117,7 +200,8 @@ def poseidon_matrix(p, seed, t):
             for i in range(t)]
 
 
-DefaultParams = poseidon_params(SNARK_SCALAR_FIELD, 6, 8, 57, b'poseidon', 5, security_target=126)
+# Importing the module only reads the on-disk cache
+DefaultParams = poseidon_params(SNARK_SCALAR_FIELD, 6, 8, 57, b'poseidon', 5, security_target=126, store=False)
 
 
 def poseidon_sbox(state, i, params):
@@ -147,7 +231,28 @@ def poseidon_mix(state, M, p):
              for i in range(len(M)) ]
 
 
-def poseidon(inputs, params=None, chained=False, trace=False):
+# Alternative implementations of the permutation, which must produce identical
+# results to `poseidon_reference`. Selected per call or via `set_poseidon_engine`
+POSEIDON_ENGINES = dict()
+
+_default_engine = 'reference'
+
+
+def set_poseidon_engine(name):
+    """
+    Select the implementation used by `poseidon()` when no engine is specified
+    """
+    global _default_engine
+    if name not in POSEIDON_ENGINES:
+        raise ValueError("Unknown Poseidon engine: %r" % (name,))
+    _default_engine = name
+
+
+def get_poseidon_engine():
+    return _default_engine
+
+
+def poseidon(inputs, params=None, chained=False, trace=False, engine=None):
     """
     Main instansiation of the Poseidon permutation
 
@@ -174,6 +279,23 @@ def poseidon(inputs, params=None, chained=False, trace=False):
     appropriately chosen parameters. The permutation can be 'chained' together
     to form a sponge construct.
     """
+    if engine is None:
+        engine = _default_engine
+    if trace:
+        # Only the reference implementation exposes the intermediate state
+        engine = 'reference'
+    try:
+        impl = POSEIDON_ENGINES[engine]
+    except KeyError:
+        raise ValueError("Unknown Poseidon engine: %r" % (engine,))
+    return impl(inputs, params, chained, trace)
+
+
+def poseidon_reference(inputs, params=None, chained=False, trace=False):
+    """
+    Reference implementation of the permutation, every round is computed
+    as described in the paper with a full matrix-vector product.
+    """
     if params is None:
         params = DefaultParams
     assert isinstance(params, PoseidonParamsType)
@@ -183,6 +305,7 @@ def poseidon(inputs, params=None, chained=False, trace=False):
         assert len(inputs) < params.t
     state = [0] * params.t
     state[:len(inputs)] = inputs
+    state = [native(_) for _ in state]
     for i, C_i in enumerate(params.constants_C):
         state = [_ + C_i for _ in state]  # ARK(.)
         poseidon_sbox(state, i, params)
@@ -192,5 +315,8 @@ def poseidon(inputs, params=None, chained=False, trace=False):
                 print('%d %d' % (i, j), '=', val)
     if chained:
         # Provide the full state as output in 'chained' mode
-        return state
-    return state[0]
+        return [int(_) for _ in state]
+    return int(state[0])
+
+
+POSEIDON_ENGINES['reference'] = poseidon_reference
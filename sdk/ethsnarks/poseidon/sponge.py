@@ -0,0 +1,123 @@
+"""
+Incremental Poseidon sponge
+
+The raw permutation can only absorb `t - 1` elements. The sponge construction
+splits the state into a `rate` part, which inputs are added to, and a
+`capacity` part which is never directly touched by inputs or outputs:
+
+      m_0        m_1               out_0
+       |          |                  ^
+    [ (+) ]    [ (+) ]               |
+    [  r  ] -> [  r  ] -> ... ->  [  r  ] -> ...
+    [ P() ]    [ P() ]            [ P() ]
+    [  c  ] -> [  c  ] -> ... ->  [  c  ] -> ...
+
+Messages are padded with a single `1` followed by zeros to a multiple of the
+rate, so messages which only differ by trailing zeros hash differently.
+
+Elements are absorbed one block at a time, so arbitrarily long inputs, including
+iterators, are hashed in constant memory.
+"""
+
+from .permutation import DefaultParams, PoseidonParamsType, poseidon
+
+
+class PoseidonSponge(object):
+    __slots__ = ('params', 'rate', 'capacity', '_state', '_buffer', '_squeezed', '_squeeze_offset', '_first')
+
+    def __init__(self, params=None, capacity=1):
+        if params is None:
+            params = DefaultParams
+        assert isinstance(params, PoseidonParamsType)
+        if capacity < 1 or capacity >= params.t:
+            raise ValueError("Capacity must be in range: 0 < capacity < t")
+        self.params = params
+        self.capacity = capacity
+        self.rate = params.t - capacity
+        self._state = [0] * params.t
+        self._buffer = []
+        self._squeezed = False
+        self._squeeze_offset = 0
+        self._first = None
+
+    def _permute(self):
+        self._state = poseidon(self._state, self.params, chained=True)
+
+    def _absorb_block(self, block):
+        p = self.params.p
+        state = self._state
+        for i, x in enumerate(block):
+            state[i] = (state[i] + x) % p
+        self._permute()
+
+    def update(self, elements):
+        """
+        Absorb a sequence or iterator of field elements, returns `self`
+        """
+        if self._squeezed:
+            raise RuntimeError("Cannot absorb after the sponge has been squeezed")
+        p = self.params.p
+        buffer = self._buffer
+        for x in elements:
+            buffer.append(int(x) % p)
+            if len(buffer) == self.rate:
+                self._absorb_block(buffer)
+                del buffer[:]
+        return self
+
+    def _finalize(self):
+        # Pad with 1 followed by zeros to a multiple of the rate
+        block = self._buffer + [1]
+        block += [0] * (self.rate - len(block))
+        self._absorb_block(block)
+        self._buffer = []
+        self._squeezed = True
+        self._first = self._state[0]
+
+    def squeeze(self, n=1):
+        """
+        Return the next `n` output elements, no further input can be absorbed
+        """
+        if not self._squeezed:
+            self._finalize()
+        result = []
+        while len(result) < n:
+            if self._squeeze_offset == self.rate:
+                self._permute()
+                self._squeeze_offset = 0
+            take = min(n - len(result), self.rate - self._squeeze_offset)
+            result += self._state[self._squeeze_offset:self._squeeze_offset + take]
+            self._squeeze_offset += take
+        return result
+
+    def digest(self):
+        """
+        Return the first output element, without modifying the sponge
+
+        This is the same value even after `squeeze` has been called.
+        """
+        if self._first is None:
+            return self.copy().squeeze(1)[0]
+        return self._first
+
+    def copy(self):
+        """
+        Return an independent copy of the sponge, including any buffered input
+        """
+        other = PoseidonSponge.__new__(PoseidonSponge)
+        other.params = self.params
+        other.capacity = self.capacity
+        other.rate = self.rate
+        other._state = list(self._state)
+        other._buffer = list(self._buffer)
+        other._squeezed = self._squeezed
+        other._squeeze_offset = self._squeeze_offset
+        other._first = self._first
+        return other
+
+
+def poseidon_sponge(elements, params=None, capacity=1):
+    """
+    Hash a sequence or iterator of field elements of any length
+    """
+    return PoseidonSponge(params, capacity).update(elements).digest()
@@ -0,0 +1,112 @@
+"""
+Serialization of points, field elements and messages for hashing
+
+The signature schemes hash their inputs either as bytes (the nonce, via
+`sha512`) or as a sequence of bits (the Pedersen hash of `PureEdDSA`). Both
+used to be assembled by concatenating immutable `bytes` or appending to a
+`bitstring.BitArray` per value, the writers here build the whole encoding in
+a single `bytearray` or integer instead.
+
+`BitWriter` accumulates bits least-significant first: the first bit of the
+stream is bit 0 of `value`. Field elements contribute their bits LSB first,
+bytes contribute the bits of each byte MSB first, matching `FQ.bits()` and
+`bitstring.BitArray(bytes)` respectively.
+"""
+
+import bitstring
+
+from .field import FQ, field_nbits, field_nbytes
+from .jubjub import Point
+
+
+# Reverses the order of bits in a byte
+REV8 = bytes(int('{:08b}'.format(_)[::-1], 2) for _ in range(256))
+
+
+class ByteWriter(object):
+    """
+    Little-endian byte encoding, equal to `_SignatureScheme.to_bytes`
+    """
+    __slots__ = ('buffer',)
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def write(self, *args):
+        buffer = self.buffer
+        for M in args:
+            if isinstance(M, Point):
+                nbytes = field_nbytes(M.x.m)
+                buffer += int(M.x).to_bytes(nbytes, 'little')
+                buffer += int(M.y).to_bytes(nbytes, 'little')
+            elif isinstance(M, FQ):
+                buffer += int(M).to_bytes(field_nbytes(M.m), 'little')
+            elif isinstance(M, (list, tuple)):
+                # Note: (list,tuple) must go *below* other class types to avoid type confusion
+                self.write(*M)
+            elif isinstance(M, int):
+                buffer += M.to_bytes(32, 'little')
+            elif isinstance(M, bitstring.BitArray):
+                buffer += M.tobytes()
+            elif isinstance(M, bytes):
+                buffer += M
+            else:
+                raise TypeError("Bad type for M: " + str(type(M)))
+        return self
+
+    def getvalue(self):
+        return bytes(self.buffer)
+
+
+class BitWriter(object):
+    """
+    Bit encoding, equal to `_SignatureScheme.to_bits`
+    """
+    __slots__ = ('value', 'nbits')
+
+    def __init__(self):
+        self.value = 0
+        self.nbits = 0
+
+    def write_uint(self, n, nbits):
+        """
+        Append the `nbits` least significant bits of `n`, LSB first
+        """
+        self.value |= int(n) << self.nbits
+        self.nbits += nbits
+        return self
+
+    def write(self, *args):
+        for M in args:
+            if isinstance(M, Point):
+                self.write_uint(M.x.n, field_nbits(M.x.m))
+            elif isinstance(M, FQ):
+                self.write_uint(M.n, field_nbits(M.m))
+            elif isinstance(M, (list, tuple)):
+                # Note: (list,tuple) must go *below* other class types to avoid type confusion
+                self.write(*M)
+            elif isinstance(M, bytes):
+                self.write_uint(int.from_bytes(M.translate(REV8), 'little'), len(M) * 8)
+            elif isinstance(M, bitstring.BitArray):
+                if len(M):
+                    self.write_uint(int(M.bin[::-1], 2), len(M))
+            else:
+                raise TypeError("Bad type for M: " + str(type(M)))
+        return self
+
+    def windows(self):
+        """
+        Split the bits into 3-bit windows, the last is padded with zeros
+        """
+        n_windows = -(-self.nbits // 3)
+        data = self.value.to_bytes(-(-n_windows // 8) * 3, 'little')
+        result = []
+        for i in range(0, len(data), 3):
+            chunk = int.from_bytes(data[i:i+3], 'little')
+            result += [(chunk >> j) & 0b111 for j in range(0, 24, 3)]
+        return result[:n_windows]
+
+    def to_bitarray(self):
+        nbytes = -(-self.nbits // 8)
+        data = self.value.to_bytes(nbytes, 'little').translate(REV8)
+        return bitstring.BitArray(data)[:self.nbits]
@@ -21,6 +21,7 @@ from sdk.ethsnarks.field import FQ, SNARK_SCALAR_FIELD
 from sdk.ethsnarks.poseidon import poseidon_params, poseidon
 from sdk.sig_utils.ecdsa_utils import *
 from sdk.sig_utils.eddsa_utils import *
+from sdk.sig_utils.bulk_sign_utils import OrderBulkSigner
 
 LOOPRING_REST_HOST = "https://api.uat.loopring.pro"
 
@@ -83,6 +84,8 @@ class LoopringV3Client(RestClient):
         self.tokenIds = {}
         self.tokenNames = {}
         self.tokenDecimals = {}
+        self.orderSigner = None
+        self.orderSignHelper = None
 
         self.init(LOOPRING_REST_HOST)
         self.start()
@@ -797,6 +800,48 @@ class LoopringV3Client(RestClient):
     def send_order(self, base_token, quote_token, buy, price, volume, ammPoolAddress = None):
         order = self._create_order(base_token, quote_token, buy, price, volume, ammPoolAddress)
         # print(f"create new order {order}")
+        self._post_order(order)
+
+    def send_orders(self, orders, processes = None):
+        """
+        Place many orders, e.g. a price ladder, signing them across worker processes.
+
+        Each item of `orders` is a tuple of `send_order` arguments:
+            (base_token, quote_token, buy, price, volume[, ammPoolAddress])
+        """
+        unsigned = [self._build_order(*_) for _ in orders]
+        signer = self._get_order_signer(processes)
+        for order, (msgHash, signedMessage) in zip(unsigned, signer.sign_many(unsigned)):
+            order.update({
+                "hash"     : str(msgHash),
+                "eddsaSignature" : signedMessage
+            })
+            self._post_order(order)
+
+    def _get_order_signer(self, processes):
+        # Worker processes are kept for later batches, until the client is stopped
+        if self.orderSigner is None or self.orderSigner.processes != processes \
+                or self.orderSigner.helper_args != (self.eddsaKey,):
+            self._close_order_signer()
+            self.orderSigner = OrderBulkSigner(self.eddsaKey, processes=processes)
+        return self.orderSigner
+
+    def _get_order_sign_helper(self):
+        # One helper per key, so its signer and public key are reused across orders
+        if self.orderSignHelper is None or self.orderSignHelper.private_key != FQ(int(self.eddsaKey, 16)):
+            self.orderSignHelper = OrderEddsaSignHelper(self.eddsaKey)
+        return self.orderSignHelper
+
+    def _close_order_signer(self):
+        if self.orderSigner is not None:
+            self.orderSigner.close()
+            self.orderSigner = None
+
+    def stop(self):
+        self._close_order_signer()
+        super().stop()
+
+    def _post_order(self, order):
         data = {"security": Security.API_KEY}
 
         data.update(order)
@@ -810,6 +855,16 @@ class LoopringV3Client(RestClient):
         )
 
     def _create_order(self, base_token, quote_token, buy, price, volume, ammPoolAddress):
+        order = self._build_order(base_token, quote_token, buy, price, volume, ammPoolAddress)
+        msgHash, signedMessage = self._get_order_sign_helper().hash_and_sign(order)
+        # update signaure
+        order.update({
+            "hash"     : str(msgHash),
+            "eddsaSignature" : signedMessage
+        })
+        return order
+
+    def _build_order(self, base_token, quote_token, buy, price, volume, ammPoolAddress = None):
         if buy:
             tokenSId = self.tokenIds[quote_token]
             tokenBId = self.tokenIds[base_token]
@@ -845,7 +900,7 @@ class LoopringV3Client(RestClient):
             # "taker"         : "0000000000000000000000000000000000000000",
             # aux data
             "allOrNone"     : False,
-            "clientOrderId" : "SampleOrder-" + str(int(time()*1000)),
+            "clientOrderId" : "SampleOrder-%d-%d-%d" % (int(time()*1000), tokenSId, orderId),
             "orderType"     : "LIMIT_ORDER"
         }
 
@@ -857,14 +912,6 @@ class LoopringV3Client(RestClient):
             order["orderType"]   = "AMM"
             order["fillAmountBOrS"] = False
 
-        signer = OrderEddsaSignHelper(self.eddsaKey)
-        msgHash = signer.hash(order)
-        signedMessage = signer.sign(order)
-        # update signaure
-        order.update({
-            "hash"     : str(msgHash),
-            "eddsaSignature" : signedMessage
-        })
         return order
 
     def on_send_order(self, data, request):
@@ -0,0 +1,78 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from sdk.ethsnarks.jubjub import generator_table
+from sdk.sig_utils.eddsa_utils import OrderEddsaSignHelper
+
+# Helper owned by each worker process, see `_init_worker`
+_worker_helper = None
+
+
+def _init_worker(helper_class, helper_args):
+    global _worker_helper
+    _worker_helper = helper_class(*helper_args)
+    # Pay for the key, hash parameters and generator table before the first job arrives
+    _worker_helper.signer
+    generator_table()
+
+
+def _sign_chunk(items):
+    return [_worker_helper.hash_and_sign(_) for _ in items]
+
+
+class EddsaBulkSigner:
+    """
+    Signs many requests with an EdDSA sign helper, sharded across processes
+
+    Signing is pure-Python curve arithmetic which holds the GIL, so threads
+    don't help. Each worker process builds its own `helper_class(*helper_args)`
+    once, when the pool starts, and every job after that only pays for the
+    signature itself.
+
+    With `processes` of None or 1 everything is signed in the calling process.
+    """
+    def __init__(self, helper_class, *helper_args, processes=None, chunk_size=None):
+        self.helper = helper_class(*helper_args)
+        self.helper_args = helper_args
+        self.chunk_size = chunk_size
+        self.processes = processes
+        self._executor = None
+        if processes is not None and processes > 1:
+            # Forking a process that may already run threads can deadlock the
+            # children, so the workers are spawned and set up by `_init_worker`
+            self._executor = ProcessPoolExecutor(max_workers=processes,
+                                                 mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=_init_worker,
+                                                 initargs=(helper_class, helper_args))
+
+    def sign_many(self, items):
+        """
+        Returns a list of `(hash, signature)`, in the same order as `items`
+        """
+        items = list(items)
+        if self._executor is None or len(items) < 2:
+            return [self.helper.hash_and_sign(_) for _ in items]
+
+        chunk_size = self.chunk_size or max(1, -(-len(items) // (self.processes * 4)))
+        chunks = [items[i:i+chunk_size] for i in range(0, len(items), chunk_size)]
+        result = []
+        for chunk in self._executor.map(_sign_chunk, chunks):
+            result.extend(chunk)
+        return result
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class OrderBulkSigner(EddsaBulkSigner):
+    def __init__(self, private_key, processes=None, chunk_size=None):
+        super(OrderBulkSigner, self).__init__(OrderEddsaSignHelper, private_key,
+                                              processes=processes, chunk_size=chunk_size)
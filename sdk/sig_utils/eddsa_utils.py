@@ -1,4 +1,4 @@
-from sdk.ethsnarks.eddsa import PureEdDSA, PoseidonEdDSA
+from sdk.ethsnarks.eddsa import PureEdDSA, PoseidonEdDSA, EdDSASigner
 from sdk.ethsnarks.field import FQ, SNARK_SCALAR_FIELD
 from sdk.ethsnarks.poseidon import poseidon_params, poseidon
 from sdk.ethsnarks.eddsa import Signature, SignedMessage
@@ -12,6 +12,14 @@ class EddsaSignHelper:
         self.private_key = FQ(int(private_key, 16))
         assert self.private_key != FQ.zero()
         # print(f"self.private_key = {self.private_key}")
+        self._signer = None
+
+    @property
+    def signer(self):
+        # Created on first use, caches the public key for every later signature
+        if self._signer is None:
+            self._signer = EdDSASigner(self.private_key, PoseidonEdDSA)
+        return self._signer
 
     def hash(self, structure_data):
         serialized_data = self.serialize_data(structure_data)
@@ -19,8 +27,17 @@ class EddsaSignHelper:
         return msgHash
 
     def sign(self, structure_data):
+        return self.sign_hash(self.hash(structure_data))
+
+    def hash_and_sign(self, structure_data):
+        """
+        Returns `(hash, signature)`, hashing the data only once
+        """
         msgHash = self.hash(structure_data)
-        signedMessage = PoseidonEdDSA.sign(msgHash, self.private_key)
+        return msgHash, self.sign_hash(msgHash)
+
+    def sign_hash(self, msgHash):
+        signedMessage = self.signer.sign(msgHash)
         # print("sign=", signedMessage)
         return "0x" + "".join([
                         hex(int(signedMessage.sig.R.x))[2:].zfill(64),
@@ -0,0 +1,18 @@
+"""
+The tests never write to the user's on-disk cache, everything derived while
+they run goes to a temporary directory which is removed afterwards
+"""
+
+import os
+import shutil
+import tempfile
+
+
+_CACHE_DIR = tempfile.mkdtemp(prefix='ethsnarks-test-cache-')
+
+# Set before the test modules import the SDK, and inherited by worker processes
+os.environ['ETHSNARKS_CACHE_DIR'] = _CACHE_DIR
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_CACHE_DIR, ignore_errors=True)
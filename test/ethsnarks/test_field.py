@@ -0,0 +1,75 @@
+import unittest
+
+from sdk.ethsnarks import backend
+from sdk.ethsnarks.field import FQ, FR, SNARK_SCALAR_FIELD
+from sdk.ethsnarks.poseidon import poseidon
+from sdk.ethsnarks.jubjub import Point
+
+
+class TestBackends(unittest.TestCase):
+    def setUp(self):
+        self.previous = backend.get_backend()
+
+    def tearDown(self):
+        backend.set_backend(self.previous.name)
+
+    def _compute(self):
+        a = FQ(SNARK_SCALAR_FIELD - 12345)
+        b = FQ(0x2442c9e22d221abac0582cf764028d21114c9676b743f590741ffdf1f8a735ca)
+        field_ops = [a + b, a - b, a * b, a / b, 7 / b, a.inv(), (a * a).sqrt(), b ** 5, FQ(0).inv()]
+        point = Point.generator() * 0x1234
+        return [int(_) for _ in field_ops] + [int(point.x), int(point.y), poseidon([1, 2, 3])]
+
+    def test_identical_outputs(self):
+        results = dict()
+        for name in backend.available_backends():
+            backend.set_backend(name)
+            results[name] = self._compute()
+        self.assertEqual(len(set(tuple(_) for _ in results.values())), 1)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            backend.set_backend('missing')
+
+
+class TestFQ(unittest.TestCase):
+    def test_slots(self):
+        a = FQ(5)
+        self.assertFalse(hasattr(a, '__dict__'))
+        self.assertFalse(hasattr(FR(5), '__dict__'))
+        self.assertIs(type(a + a), FQ)
+
+    def test_reduction(self):
+        a = FQ(SNARK_SCALAR_FIELD - 1)
+        self.assertEqual(int(a + 2), 1)
+        self.assertEqual(int(2 - a), 3)
+        self.assertEqual(int(-a), 1)
+        self.assertEqual(int(a * a), 1)
+        self.assertEqual(a, SNARK_SCALAR_FIELD - 1)
+        self.assertNotEqual(a, FQ(1))
+
+    def test_modulus_mismatch(self):
+        with self.assertRaises(RuntimeError):
+            FQ(1) + FQ(1, 7)
+
+    def test_counting(self):
+        FQ._reset_counts()
+        try:
+            FQ(2) * FQ(3) + 1
+            self.assertEqual(FQ._COUNTS['mul'], 1)
+            self.assertEqual(FQ._COUNTS['add'], 1)
+        finally:
+            FQ._disable_counting()
+        FQ(2) * FQ(3)
+        self.assertIsNone(FQ._COUNTS)
+
+    def test_batch_inv(self):
+        elements = [FQ(_) for _ in (1, 2, 0, SNARK_SCALAR_FIELD - 1, 0x1234567890abcdef, 0)]
+        self.assertEqual(FQ.batch_inv(elements), [_.inv() for _ in elements])
+        self.assertEqual(FQ.batch_inv([]), [])
+        with self.assertRaises(ValueError):
+            FQ.batch_inv([FQ(1), FQ(1, 7)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+
+from sdk.ethsnarks.field import FQ
+from sdk.ethsnarks.jubjub import Point, EtecPoint, normalize_batch
+from sdk.ethsnarks.jubjub import AbstractCurveOps, JUBJUB_E, JUBJUB_L
+from sdk.ethsnarks.jubjub import FixedBaseTable, generator_table, mult_naf_lut
+from sdk.ethsnarks.jubjub import multi_scalar_mult, PIPPENGER_THRESHOLD, in_prime_subgroup
+
+
+SCALARS = [0, 1, 2, 3, 31, 32, 33, JUBJUB_L - 1, JUBJUB_L, JUBJUB_E - 1,
+           0x623167b48a61c02c546fef1bb0d810f4c0d14802b7669ef5b9de9af83212de]
+
+
+class TestNormalize(unittest.TestCase):
+    def test_normalize_batch(self):
+        B = Point.generator()
+        points = [B.as_etec() * 3, B.as_proj() * 5, B * 7, (B * 11).as_mont(), EtecPoint.infinity()]
+        expected = [_.as_point() for _ in points]
+        self.assertEqual(normalize_batch(points), expected)
+        self.assertEqual(normalize_batch([]), [])
+
+
+class TestMult(unittest.TestCase):
+    def test_matches_double_and_add(self):
+        B = Point.generator()
+        other = Point.from_hash(b'test')
+        for base in (B, other, Point.infinity()):
+            for k in SCALARS:
+                self.assertEqual(base * k, AbstractCurveOps.mult(base, k))
+        self.assertEqual(B * FQ(12345), B * 12345)
+        self.assertEqual(B * JUBJUB_L, Point.infinity())
+
+    def test_negative_scalar(self):
+        B = Point.generator()
+        other = Point.from_hash(b'test')
+        for base in (B, other):
+            for k in (1, 5, JUBJUB_L - 1, (1 << 300) + 5):
+                expected = (base * k).neg()
+                self.assertEqual(base * -k, expected)
+                self.assertEqual(AbstractCurveOps.mult(base, -k), expected)
+                self.assertEqual(base.as_etec().mult(-k).as_point(), expected)
+
+
+class TestFixedBase(unittest.TestCase):
+    def test_generator_table(self):
+        B = Point.generator()
+        table = generator_table()
+        for k in SCALARS + [(1 << 256) - 1]:
+            self.assertEqual(table.mult(k).as_point(), mult_naf_lut(B.as_etec(), k, 5).as_point())
+        # Scalars wider than the table fall back to the generic path
+        k = (1 << 300) + 5
+        self.assertEqual(table.mult(k).as_point(), mult_naf_lut(B.as_etec(), k, 5).as_point())
+
+    def test_serialize(self):
+        base = Point.from_hash(b'fixed-base')
+        table = FixedBaseTable(base, window=3, nbits=24)
+        data = table.serialize()
+        loaded = FixedBaseTable.deserialize(base, data, window=3, nbits=24)
+        self.assertEqual((base * 0xabcdef), loaded.mult(0xabcdef).as_point())
+        data[-1][0], data[-1][1] = data[-1][1], data[-1][0]
+        with self.assertRaises(ValueError):
+            FixedBaseTable.deserialize(base, data, window=3, nbits=24)
+        with self.assertRaises(ValueError):
+            FixedBaseTable.deserialize(Point.generator(), table.serialize(), window=3, nbits=24)
+        # Every entry is checked, not just the first of each row
+        for i, j in ((3, 3), (3, 6), (7, 2)):
+            data = table.serialize()
+            data[i][j - 1], data[i][j] = data[i][j], data[i][j - 1]
+            with self.assertRaises(ValueError):
+                FixedBaseTable.deserialize(base, data, window=3, nbits=24)
+
+
+class TestSubgroup(unittest.TestCase):
+    def test_in_prime_subgroup(self):
+        low_order = Point.all_loworder_points()
+        self.assertEqual([in_prime_subgroup(_) for _ in low_order], [True] + [False] * 7)
+        for i in range(4):
+            P = Point.from_hash(b'subgroup-%d' % (i,))
+            for T in low_order:
+                point = P + T
+                self.assertEqual(in_prime_subgroup(point), point * JUBJUB_L == Point.infinity())
+                self.assertEqual(in_prime_subgroup(point.as_etec()), T == low_order[0])
+
+
+class TestMultiScalarMult(unittest.TestCase):
+    def _expected(self, points, scalars):
+        result = Point.infinity()
+        for P, k in zip(points, scalars):
+            result += P.neg() * -k if k < 0 else P * k
+        return result
+
+    def test_straus_and_pippenger(self):
+        B = Point.generator()
+        for n in (1, 2, 3, PIPPENGER_THRESHOLD + 1):
+            points = [B if i % 4 == 0 else Point.from_hash(b'msm-%d' % (i,)) for i in range(n)]
+            scalars = [SCALARS[i % len(SCALARS)] * (-1 if i % 3 == 1 else 1) for i in range(n)]
+            result = multi_scalar_mult(points, scalars)
+            self.assertIsInstance(result, EtecPoint)
+            self.assertEqual(result.as_point(), self._expected(points, scalars))
+
+    def test_edge_cases(self):
+        B = Point.generator()
+        self.assertEqual(multi_scalar_mult([], []).as_point(), Point.infinity())
+        self.assertEqual(multi_scalar_mult([B, B], [0, JUBJUB_L]).as_point(), Point.infinity())
+        self.assertEqual(multi_scalar_mult([B, B], [FQ(5), -5]).as_point(), Point.infinity())
+        with self.assertRaises(ValueError):
+            multi_scalar_mult([B], [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
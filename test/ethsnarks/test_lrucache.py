@@ -0,0 +1,30 @@
+import unittest
+
+from sdk.ethsnarks.lrucache import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_eviction(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        # 'b' is the least recently used
+        self.assertNotIn('b', cache)
+        self.assertEqual(cache.get('b', 0), 0)
+        self.assertEqual(tuple(cache.cache_info()), (1, 1, 2, 2))
+        cache.resize(1)
+        self.assertEqual(list(cache._data), ['c'])
+
+    def test_disabled(self):
+        cache = LRUCache(0)
+        cache.put('a', 1)
+        self.assertEqual(len(cache), 0)
+        self.assertIsNone(cache.get('a'))
+        with self.assertRaises(ValueError):
+            LRUCache(-1)
+
+
+if __name__ == "__main__":
+    unittest.main()
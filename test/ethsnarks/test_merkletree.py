@@ -0,0 +1,219 @@
+import shutil
+import tempfile
+import unittest
+
+from sdk.ethsnarks.merkletree import MerkleTree, SparseMerkleTree, MerkleHasher_MiMC, MerkleHasher_Poseidon
+from sdk.ethsnarks.poseidon import DefaultParams
+from sdk.ethsnarks.field import FQ
+
+
+class TestBulkBuild(unittest.TestCase):
+    def _sequential(self, leaves, n_items, width=2, hasher=None):
+        tree = MerkleTree(n_items, width, hasher)
+        for leaf in leaves:
+            tree.append(leaf)
+        return tree
+
+    def _assertSameTree(self, tree, expected):
+        self.assertEqual(len(tree), len(expected))
+        self.assertEqual(tree.root, expected.root)
+        self.assertEqual(tree._leaves, expected._leaves)
+        for i in range(len(expected)):
+            self.assertEqual(tree.proof(i)[:3], expected.proof(i)[:3])
+
+    def test_from_leaves(self):
+        leaves = [i * 7 + 3 for i in range(13)]
+        for n in (1, 2, 5, 8, 13):
+            self._assertSameTree(MerkleTree.from_leaves(leaves[:n], 16),
+                                 self._sequential(leaves[:n], 16))
+        self.assertEqual(MerkleTree.from_leaves(leaves)._n_items, 16)
+
+    def test_extend(self):
+        leaves = [i * 5 + 1 for i in range(20)]
+        tree = MerkleTree(32)
+        for start, end in ((0, 3), (3, 4), (4, 4), (4, 11), (11, 20)):
+            tree.extend(leaves[start:end])
+            self._assertSameTree(tree, self._sequential(leaves[:end], 32))
+        with self.assertRaises(RuntimeError):
+            tree.extend(range(1, 14))
+        self.assertEqual(len(tree), 20)
+
+    def test_poseidon_quad_tree(self):
+        hasher = MerkleHasher_Poseidon.factory(DefaultParams)
+        leaves = list(range(1, 23))
+        self._assertSameTree(MerkleTree.from_leaves(leaves, 64, 4, hasher),
+                             self._sequential(leaves, 64, 4, hasher))
+
+    def test_processes(self):
+        leaves = list(range(1, 600))
+        tree = MerkleTree.from_leaves(leaves, 1024, hasher=MerkleHasher_MiMC, processes=2)
+        self.assertEqual(tree._leaves, MerkleTree.from_leaves(leaves, 1024)._leaves)
+        hasher = MerkleHasher_Poseidon.factory(DefaultParams)
+        tree = MerkleTree.from_leaves(leaves, 1024, 4, hasher, processes=2)
+        self.assertEqual(tree._leaves, MerkleTree.from_leaves(leaves, 1024, 4, hasher)._leaves)
+
+
+class _CountingHasher(MerkleHasher_MiMC):
+    def __init__(self, *args):
+        super(_CountingHasher, self).__init__(*args)
+        self.count = 0
+
+    def hash_node(self, depth, *args):
+        self.count += 1
+        return super(_CountingHasher, self).hash_node(depth, *args)
+
+    def hash_nodes(self, depth, nodes, processes=None):
+        self.count += len(nodes)
+        return super(_CountingHasher, self).hash_nodes(depth, nodes, processes)
+
+
+class TestDeferredUpdates(unittest.TestCase):
+    def test_matches_immediate(self):
+        tree = MerkleTree(16)
+        deferred = MerkleTree(16, deferred=True)
+        for i in range(11):
+            tree.append(i + 1)
+            deferred.append(i + 1)
+        self.assertEqual(deferred.root, tree.root)
+        for index, leaf in ((3, 100), (4, 101), (3, 102), (10, 103)):
+            tree[index] = leaf
+            deferred[index] = leaf
+        deferred.append(12)
+        tree.append(12)
+        self.assertEqual(deferred._dirty, {3, 4, 10, 11})
+        self.assertEqual(deferred.proof(4)[:3], tree.proof(4)[:3])
+        self.assertEqual(deferred._dirty, set())
+        self.assertEqual(deferred._leaves, tree._leaves)
+
+    def test_hashes_dirty_nodes_once(self):
+        tree = MerkleTree.from_leaves(range(1, 257), hasher=_CountingHasher)
+        tree.deferred = True
+        tree._hasher.count = 0
+        for index in range(64, 72):
+            tree[index] = index * 2
+        self.assertEqual(tree._hasher.count, 0)
+        tree.commit()
+        # 4 + 2 + 1 nodes below the common ancestor, then 5 on its path to the root
+        self.assertEqual(tree._hasher.count, 12)
+        root = tree.root
+        self.assertEqual(tree._hasher.count, 12)
+        tree.deferred = False
+        tree[0] = 5
+        self.assertEqual(tree._hasher.count, 20)
+        self.assertNotEqual(tree.root, root)
+
+
+class TestMmapStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_matches_memory(self):
+        expected = MerkleTree(64)
+        with MerkleTree(64, path=self.tmpdir) as tree:
+            for i in range(1, 20):
+                tree.append(i)
+                expected.append(i)
+            tree.extend(range(20, 30))
+            expected.extend(range(20, 30))
+            tree[4] = 99
+            expected[4] = 99
+            self.assertEqual([list(_) for _ in tree._leaves], expected._leaves)
+
+        tree = MerkleTree(64, path=self.tmpdir, deferred=True)
+        self.assertEqual(len(tree), 29)
+        self.assertEqual(tree.root, expected.root)
+        self.assertEqual(tree.proof(4)[:3], expected.proof(4)[:3])
+        tree[0] = 100
+        expected[0] = 100
+        tree.close()
+
+        tree = MerkleTree(64, path=self.tmpdir)
+        self.assertEqual((tree[0], tree.root), (100, expected.root))
+        tree.close()
+        with self.assertRaises(ValueError):
+            MerkleTree(128, path=self.tmpdir)
+
+
+class TestLeafIndex(unittest.TestCase):
+    def _check(self, tree, plain):
+        for leaf in range(0, 12):
+            self.assertEqual(leaf in tree, leaf in plain)
+            self.assertEqual(tree.indices(leaf), plain.indices(leaf))
+            if leaf in plain:
+                self.assertEqual(tree.index(leaf), plain.index(leaf))
+
+    def test_matches_scan(self):
+        tree = MerkleTree(16, leaf_index=True)
+        plain = MerkleTree(16)
+        for t in (tree, plain):
+            t.extend([5, 3, 5, 7])
+            t.append(5)
+            t[2] = 9
+            t[1] = 5
+            t[0] = 3
+        self.assertEqual(plain.indices(5), [1, 4])
+        self._check(tree, plain)
+        self.assertEqual(tree._positions, {3: 0, 5: [1, 4], 9: 2, 7: 3})
+        with self.assertRaises(ValueError):
+            tree.index(11)
+        # Leaves given as field elements are found the same way with the index
+        for t in (tree, plain):
+            self.assertTrue(FQ(9) in t)
+            self.assertEqual((t.index(FQ(5)), t.indices(FQ(5))), (1, [1, 4]))
+
+    def test_switch(self):
+        tree = MerkleTree(8)
+        tree.extend([4, 4, 2])
+        self.assertEqual(tree.leaf_index_size(), 0)
+        tree.leaf_index = True
+        self.assertEqual(tree.indices(4), [0, 1])
+        self.assertGreater(tree.leaf_index_size(), 0)
+        tree.leaf_index = False
+        self.assertFalse(tree.leaf_index)
+        tree.append(4)
+        self.assertEqual(tree.indices(4), [0, 1, 3])
+
+
+class TestSparseMerkleTree(unittest.TestCase):
+    def test_matches_full_tree(self):
+        dense = MerkleTree(8)
+        sparse = SparseMerkleTree(3)
+        for i in range(8):
+            dense.append(i * 3 + 1)
+            sparse[i] = i * 3 + 1
+        self.assertEqual(sparse.root, dense.root)
+        self.assertEqual(sparse.proof(5)[:3], dense.proof(5)[:3])
+        self.assertTrue(sparse.proof(5).verify(sparse.root))
+
+    def test_sparse(self):
+        empty_root = SparseMerkleTree(32).root
+        tree = SparseMerkleTree(32)
+        tree[(1 << 32) - 1] = 1234
+        tree[7] = 5678
+        self.assertEqual(len(tree), 2)
+        self.assertEqual(tree[8], 0)
+        for index in (0, 7, (1 << 32) - 1):
+            self.assertTrue(tree.proof(index).verify(tree.root))
+        # Resetting leaves to the default removes their nodes again
+        tree[7] = 0
+        tree[(1 << 32) - 1] = 0
+        self.assertEqual(tree._nodes, {})
+        self.assertEqual(tree.root, empty_root)
+        with self.assertRaises(KeyError):
+            tree[1 << 32] = 1
+
+    def test_poseidon_quad_tree(self):
+        tree = SparseMerkleTree(6, 4, MerkleHasher_Poseidon.factory(DefaultParams))
+        tree[1000] = 42
+        tree[1001] = 43
+        proof = tree.proof(1001)
+        self.assertEqual(len(proof.path[0]), 3)
+        self.assertTrue(proof.verify(tree.root))
+        self.assertFalse(tree.proof(3).verify(tree.root + 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from sdk.ethsnarks import cache
+from sdk.ethsnarks.field import SNARK_SCALAR_FIELD
+from sdk.ethsnarks.mimc import mimc, mimc_hash, mimc_round_constants, mimc_batch, mimc_hash_batch
+from sdk.ethsnarks.mimc import permutation
+from sdk.ethsnarks.mimc.permutation import mimc_constants
+from sdk.ethsnarks.mimc.batch import MIN_PARALLEL_BATCH
+
+
+class TestMiMCConstants(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.saved_cache_dir = cache.set_cache_dir(self.tmpdir)
+
+    def tearDown(self):
+        cache.set_cache_dir(self.saved_cache_dir)
+        shutil.rmtree(self.tmpdir)
+
+    def test_known_results(self):
+        self.assertEqual(mimc(1, 1), 2447343676970420247355835473667983267115132689045447905848734383579598297563)
+        self.assertEqual(mimc_hash([1, 1]), 4087330248547221366577133490880315793780387749595119806283278576811074525767)
+
+    def test_memoized(self):
+        constants = mimc_round_constants('EdDSA_Verify.RAM')
+        self.assertIs(constants, mimc_round_constants(b'EdDSA_Verify.RAM'))
+        self.assertEqual(constants, tuple(_ % SNARK_SCALAR_FIELD for _ in mimc_constants(b'EdDSA_Verify.RAM')))
+
+    def test_disk_cache_roundtrip(self):
+        key = permutation._constants_key(b'mimc-cache-test', SNARK_SCALAR_FIELD, 10)
+        first = mimc_round_constants(b'mimc-cache-test', R=10)
+        self.assertTrue(os.path.exists(cache.cache_path(permutation._constants_cache_name(key))))
+        del permutation._CONSTANTS[key]
+        second = mimc_round_constants(b'mimc-cache-test', R=10)
+        self.assertIsNot(first, second)
+        self.assertEqual(first, second)
+
+
+class TestMiMCBatch(unittest.TestCase):
+    def test_mimc_batch(self):
+        xs = [0, 1, SNARK_SCALAR_FIELD - 1, 12345]
+        ks = [1, 0, SNARK_SCALAR_FIELD - 2, 67890]
+        self.assertEqual(mimc_batch(xs, ks), [mimc(x, k) for x, k in zip(xs, ks)])
+        self.assertEqual(mimc_batch(xs, 5, seed=b'other'), [mimc(x, 5, b'other') for x in xs])
+        self.assertEqual(mimc_batch([], []), [])
+        with self.assertRaises(ValueError):
+            mimc_batch(xs, ks[:2])
+
+    def test_mimc_hash_batch(self):
+        messages = [[1, 1], [3, 4, 5], [], [7]]
+        self.assertEqual(mimc_hash_batch(messages, 9), [mimc_hash(_, 9) for _ in messages])
+        self.assertEqual(mimc_hash_batch(messages, [1, 2, 3, 4], seed='EdDSA_Verify.RAM'),
+                         [mimc_hash(m, k, 'EdDSA_Verify.RAM') for m, k in zip(messages, [1, 2, 3, 4])])
+
+    def test_processes(self):
+        messages = [[i, i * 3] for i in range(MIN_PARALLEL_BATCH)]
+        self.assertEqual(mimc_hash_batch(messages, processes=2), mimc_hash_batch(messages))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from sdk.ethsnarks.mmaparray import MmapArray, HEADER_SIZE, RECORD_SIZE
+
+
+class TestMmapArray(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'array.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_list_operations(self):
+        array = MmapArray(self.path)
+        expected = [(1 << 255) + i for i in range(100)]
+        array.append(expected[0])
+        array.extend(expected[1:])
+        array[3] = 7
+        expected[3] = 7
+        self.assertEqual(list(array), expected)
+        self.assertEqual((len(array), array[-1], array.index(7)), (100, expected[-1], 3))
+        self.assertTrue(7 in array)
+        del array[10:]
+        self.assertEqual(list(array), expected[:10])
+        with self.assertRaises(IndexError):
+            array[10]
+        with self.assertRaises(TypeError):
+            del array[2:4]
+        array.close()
+
+    def test_reopen(self):
+        with self.assertRaises(ValueError):
+            MmapArray(self.path, b'x' * 17)
+        array = MmapArray(self.path, b'tag')
+        array.extend(range(1000))
+        array.flush()
+        array[5] = 12345
+        array.close()
+        self.assertGreaterEqual(os.path.getsize(self.path), HEADER_SIZE + 1000 * RECORD_SIZE)
+
+        array = MmapArray(self.path, b'tag')
+        self.assertEqual(len(array), 1000)
+        self.assertEqual((array[5], array[999]), (12345, 999))
+        array.close()
+        with self.assertRaises(ValueError):
+            MmapArray(self.path, b'other')
+
+    def test_header_only_file(self):
+        array = MmapArray(self.path)
+        array.close()
+        with open(self.path, 'r+b') as handle:
+            handle.truncate(HEADER_SIZE)
+        array = MmapArray(self.path)
+        array.extend(range(3))
+        self.assertEqual(list(array), [0, 1, 2])
+        array.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import tracemalloc
+from threading import Thread
+
+from sdk.ethsnarks import cache
+from sdk.ethsnarks.jubjub import EtecPoint
+from sdk.ethsnarks.pedersen import pedersen_hash_basepoint, pedersen_hash_bytes
+from sdk.ethsnarks.pedersen import pedersen_hash_windows, pedersen_table, PedersenTable, _PEDERSEN_TABLES
+from sdk.ethsnarks.pedersen import pedersen_hash_bits, PedersenHasher
+
+
+def _reference_hash_windows(name, windows):
+    # Windowed hash as originally implemented, deriving every base point and multiple
+    result = EtecPoint.infinity()
+    for j, window in enumerate(windows):
+        if j % 62 == 0:
+            current = pedersen_hash_basepoint(name, j // 62)
+        else:
+            current = current.double().double().double().double()
+        segment = current * ((window & 0b11) + 1)
+        if window > 0b11:
+            segment = segment.neg()
+        result += segment
+    return result.as_point()
+
+
+class _CountingTable(PedersenTable):
+    def __init__(self, name):
+        self.n_stores = 0
+        super(_CountingTable, self).__init__(name)
+
+    def _store(self):
+        self.n_stores += 1
+        super(_CountingTable, self)._store()
+
+
+class TestPedersenTables(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.saved_cache_dir = cache.set_cache_dir(self.tmpdir)
+
+    def tearDown(self):
+        cache.set_cache_dir(self.saved_cache_dir)
+        shutil.rmtree(self.tmpdir)
+
+    def test_matches_reference(self):
+        windows = [(i * 5) % 8 for i in range(130)]
+        for n in (1, 61, 62, 63, 130):
+            self.assertEqual(pedersen_hash_windows(b'test', windows[:n]),
+                             _reference_hash_windows(b'test', windows[:n]))
+
+    def test_disk_cache(self):
+        table = PedersenTable('test-disk-cache')
+        table.segment(1)
+        self.assertFalse(os.path.exists(cache.cache_path(table._cache_name())))
+        table.flush()
+        self.assertTrue(os.path.exists(cache.cache_path(table._cache_name())))
+        loaded = PedersenTable(b'test-disk-cache')
+        self.assertEqual(len(loaded.segments), 2)
+        self.assertEqual(loaded._affine_segments(), table._affine_segments())
+        self.assertEqual(len(PedersenTable('other-name').segments), 0)
+
+    def test_corrupt_cache(self):
+        table = PedersenTable('test-corrupt-cache')
+        table.segment(1)
+        table.flush()
+        path = cache.cache_path(table._cache_name())
+        with open(path) as handle:
+            data = json.load(handle)
+        # Swapped points in the middle of a segment, and a different segment base
+        for k, i, j in ((1, 20, 21), (0, 0, 4), (1, 5, 6)):
+            segments = [list(_) for _ in data['segments']]
+            segments[k][i], segments[k][j] = segments[k][j], segments[k][i]
+            with open(path, 'w') as handle:
+                json.dump(dict(data, segments=segments), handle)
+            self.assertEqual(len(PedersenTable('test-corrupt-cache').segments), 0)
+        with open(path, 'w') as handle:
+            json.dump(dict(data, segments=data['segments'][::-1]), handle)
+        self.assertEqual(len(PedersenTable('test-corrupt-cache').segments), 0)
+
+    def test_stored_once_per_hash(self):
+        table = _CountingTable(b'test-store-once')
+        _PEDERSEN_TABLES[table.name] = table
+        try:
+            pedersen_hash_windows(table.name, [1] * (62 * 5))
+            self.assertEqual(table.n_stores, 1)
+            pedersen_hash_windows(table.name, [2] * 62)
+            pedersen_hash_bytes(table.name, b'x' * 100)
+            self.assertEqual(table.n_stores, 1)
+            pedersen_hash_bytes(table.name, b'x' * 200)
+            self.assertEqual(table.n_stores, 2)
+        finally:
+            del _PEDERSEN_TABLES[table.name]
+
+    def test_concurrent_segments(self):
+        table = PedersenTable(b'test-threads')
+        threads = [Thread(target=table.segment, args=(k % 3,)) for k in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        expected = PedersenTable(b'test-threads')
+        for k in range(3):
+            expected.segment(k)
+        self.assertEqual(table._affine_segments(), expected._affine_segments())
+
+    def test_memoized(self):
+        self.assertIs(pedersen_table('EdDSA_Verify.M'), pedersen_table(b'EdDSA_Verify.M'))
+        with self.assertRaises(TypeError):
+            pedersen_table(5)
+        with self.assertRaises(ValueError):
+            pedersen_hash_bytes('x' * 29, b'data')
+
+
+class TestPedersenHasher(unittest.TestCase):
+    def _reference(self, data, name=b'test'):
+        bits = ''.join([bin(_)[2:].rjust(8, '0') for _ in data])
+        return pedersen_hash_bits(name, bits)
+
+    def test_matches_bit_strings(self):
+        data = bytes((i * 37 + 11) % 256 for i in range(70))
+        for n in (1, 2, 3, 4, 5, 23, 24, 70):
+            self.assertEqual(pedersen_hash_bytes(b'test', data[:n]), self._reference(data[:n]))
+
+    def test_chunks(self):
+        data = bytes((i * 91 + 3) % 256 for i in range(50))
+        expected = pedersen_hash_bytes(b'test', data)
+        for size in (1, 2, 4, 7, 50):
+            hasher = PedersenHasher(b'test')
+            for i in range(0, len(data), size):
+                hasher.update(memoryview(data)[i:i+size])
+            self.assertEqual(hasher.digest(), expected)
+            # digest doesn't consume the pending bytes
+            self.assertEqual(hasher.digest(), expected)
+        with self.assertRaises(AssertionError):
+            PedersenHasher(b'test').digest()
+
+    def _peak_memory(self, name, data):
+        tracemalloc.start()
+        try:
+            hasher = PedersenHasher(name)
+            for i in range(0, len(data), 10):
+                hasher.update(data[i:i+10])
+            result = hasher.digest()
+            return result, tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def test_bounded_memory(self):
+        # Segments past the table's limit are derived while streaming, not kept
+        table = PedersenTable(b'test-bounded', max_segments=2)
+        _PEDERSEN_TABLES[table.name] = table
+        try:
+            data = bytes((i * 53 + 7) % 256 for i in range(24 * 10 * 2))
+            short_result, short_peak = self._peak_memory(table.name, data[:240])
+            long_result, long_peak = self._peak_memory(table.name, data)
+        finally:
+            del _PEDERSEN_TABLES[table.name]
+        self.assertEqual(len(table.segments), 2)
+        self.assertLess(long_peak, short_peak * 1.5)
+        self.assertEqual(short_result, self._reference(data[:240], table.name))
+        self.assertEqual(long_result, self._reference(data, table.name))
+
+
+if __name__ == "__main__":
+    unittest.main()
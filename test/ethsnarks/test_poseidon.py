@@ -0,0 +1,182 @@
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from sdk.ethsnarks import cache
+from sdk.ethsnarks.field import SNARK_SCALAR_FIELD
+from sdk.ethsnarks.poseidon import poseidon_params, poseidon, DefaultParams
+from sdk.ethsnarks.poseidon import permutation
+from sdk.ethsnarks.poseidon.batch import MIN_PARALLEL_BATCH
+from sdk.ethsnarks.poseidon import PoseidonParamsType, set_poseidon_engine, get_poseidon_engine
+from sdk.ethsnarks.poseidon import poseidon_batch, poseidon_write_module
+from sdk.ethsnarks.poseidon import PoseidonSponge, poseidon_sponge
+
+
+def _all_params():
+    # The parameter sets used by the sign helpers, plus short partial-round
+    # variants to exercise the edge cases of the sparse factorization
+    params = [DefaultParams]
+    for t in (2, 6, 9, 10, 12, 13, 14):
+        params.append(poseidon_params(SNARK_SCALAR_FIELD, t, 6, 53, b'poseidon', 5, security_target=128))
+    for nRoundsP in (1, 2, 3):
+        params.append(PoseidonParamsType(SNARK_SCALAR_FIELD, 6, 8, nRoundsP, b'poseidon', 5,
+                                         DefaultParams.constants_C[:8 + nRoundsP], DefaultParams.constants_M))
+    return params
+
+
+def _inputs(n):
+    return [(SNARK_SCALAR_FIELD - 1 - (i * 7919)) % SNARK_SCALAR_FIELD for i in range(n)]
+
+
+class TestPoseidonParams(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.saved_cache_dir = cache.set_cache_dir(self.tmpdir)
+
+    def tearDown(self):
+        cache.set_cache_dir(self.saved_cache_dir)
+        shutil.rmtree(self.tmpdir)
+
+    def test_registry_memoizes(self):
+        a = poseidon_params(SNARK_SCALAR_FIELD, 13, 6, 53, b'poseidon', 5, security_target=128)
+        b = poseidon_params(SNARK_SCALAR_FIELD, 13, 6, 53, b'poseidon', 5, security_target=128)
+        self.assertIs(a, b)
+
+    def test_disk_cache_roundtrip(self):
+        args = (SNARK_SCALAR_FIELD, 5, 6, 53, b'poseidon-cache-test', 5)
+        key = args + (128,)
+        first = poseidon_params(*args, security_target=128)
+        self.assertTrue(os.path.exists(cache.cache_path(permutation._constants_cache_name(key))))
+        del permutation._PARAMS_REGISTRY[key]
+        # Loading from the cache doesn't write the file again
+        path = cache.cache_path(permutation._constants_cache_name(key))
+        stat = os.stat(path)
+        second = poseidon_params(*args, security_target=128)
+        self.assertEqual(os.stat(path).st_ino, stat.st_ino)
+        self.assertIsNot(first, second)
+        self.assertEqual(first, second)
+
+    def test_import_only_reads_cache(self):
+        def run(code):
+            env = dict(os.environ, ETHSNARKS_CACHE_DIR=self.tmpdir)
+            root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+            subprocess.check_call([sys.executable, '-c', code], cwd=root, env=env)
+            directory = os.path.join(self.tmpdir, 'v%d' % (cache.CACHE_VERSION,))
+            return sorted(os.listdir(directory)) if os.path.exists(directory) else []
+
+        self.assertEqual(run('import sdk.ethsnarks.eddsa'), [])
+        files = run('from sdk.ethsnarks.poseidon import *; '
+                    'from sdk.ethsnarks.mimc import *; '
+                    'poseidon_params(%d, 6, 8, 57, b"poseidon", 5, security_target=126); '
+                    'mimc(1, 1)' % (SNARK_SCALAR_FIELD,))
+        self.assertEqual([_.split('-')[0] for _ in files], ['mimc', 'poseidon'])
+        self.assertEqual(run('import sdk.ethsnarks.eddsa'), files)
+
+    def test_params_hashable(self):
+        self.assertEqual(hash(DefaultParams), hash(poseidon_params(SNARK_SCALAR_FIELD, 6, 8, 57, b'poseidon', 5, security_target=126)))
+
+
+class TestPoseidonEngines(unittest.TestCase):
+    def assertEngineMatches(self, engine):
+        for params in _all_params():
+            inputs = _inputs(params.t - 1)
+            self.assertEqual(poseidon(inputs, params, engine='reference'),
+                             poseidon(inputs, params, engine=engine))
+            inputs = _inputs(params.t)
+            self.assertEqual(poseidon(inputs, params, chained=True, engine='reference'),
+                             poseidon(inputs, params, chained=True, engine=engine))
+
+    def test_optimized(self):
+        self.assertEngineMatches('optimized')
+
+    def test_codegen(self):
+        self.assertEngineMatches('codegen')
+
+    def test_codegen_module(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'poseidon_t6.py')
+            poseidon_write_module(path, DefaultParams, 'permutation_t6')
+            namespace = dict()
+            with open(path) as handle:
+                exec(handle.read(), namespace)
+            state = _inputs(DefaultParams.t)
+            self.assertEqual(namespace['permutation_t6'](state), poseidon(state, chained=True, engine='reference'))
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_global_engine(self):
+        previous = get_poseidon_engine()
+        try:
+            set_poseidon_engine('optimized')
+            self.assertEqual(poseidon([1, 2, 3]), poseidon([1, 2, 3], engine='reference'))
+        finally:
+            set_poseidon_engine(previous)
+        with self.assertRaises(ValueError):
+            set_poseidon_engine('missing')
+
+
+class TestPoseidonBatch(unittest.TestCase):
+    def test_matches_poseidon(self):
+        for params in _all_params():
+            inputs = [_inputs(n)[::-1] for n in range(1, params.t)] * 3
+            self.assertEqual(poseidon_batch(inputs, params), [poseidon(_, params) for _ in inputs])
+
+    def test_chained(self):
+        params = _all_params()[-1]
+        inputs = [_inputs(params.t), _inputs(2)]
+        self.assertEqual(poseidon_batch(inputs, params, chained=True),
+                         [poseidon(_, params, chained=True) for _ in inputs])
+
+    def test_process_pool(self):
+        params = DefaultParams
+        inputs = [[i, i + 1] for i in range(MIN_PARALLEL_BATCH)]
+        self.assertEqual(poseidon_batch(inputs, params, processes=2, chunk_size=100),
+                         poseidon_batch(inputs, params))
+
+    def test_empty(self):
+        self.assertEqual(poseidon_batch([]), [])
+
+
+class TestPoseidonSponge(unittest.TestCase):
+    def test_incremental(self):
+        data = _inputs(23)
+        sponge = PoseidonSponge()
+        for i in range(0, len(data), 4):
+            sponge.update(data[i:i+4])
+        self.assertEqual(sponge.digest(), poseidon_sponge(data))
+        self.assertEqual(poseidon_sponge(iter(data)), poseidon_sponge(data))
+
+    def test_single_block(self):
+        # One block with padding is a single permutation of the padded input
+        data = _inputs(3)
+        padded = data + [1, 0]
+        self.assertEqual(poseidon_sponge(data), poseidon(padded + [0], chained=True)[0])
+
+    def test_padding(self):
+        self.assertNotEqual(poseidon_sponge([1, 2]), poseidon_sponge([1, 2, 0]))
+        self.assertNotEqual(poseidon_sponge([]), poseidon_sponge([0]))
+
+    def test_copy(self):
+        sponge = PoseidonSponge().update([1, 2, 3])
+        other = sponge.copy()
+        other.update([4])
+        self.assertEqual(sponge.digest(), poseidon_sponge([1, 2, 3]))
+        self.assertEqual(other.digest(), poseidon_sponge([1, 2, 3, 4]))
+
+    def test_squeeze(self):
+        sponge = PoseidonSponge(capacity=2).update(range(10))
+        first = sponge.copy().squeeze(9)
+        self.assertEqual(sponge.squeeze(2) + sponge.squeeze(7), first)
+        self.assertEqual(first[0], PoseidonSponge(capacity=2).update(range(10)).digest())
+        # The digest is the first output element, even once squeezing has started
+        self.assertEqual(sponge.digest(), first[0])
+        with self.assertRaises(RuntimeError):
+            sponge.update([1])
+
+
+if __name__ == "__main__":
+    unittest.main()
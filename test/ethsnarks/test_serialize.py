@@ -0,0 +1,40 @@
+import unittest
+
+import bitstring
+
+from sdk.ethsnarks.field import FQ, field_nbits, field_nbytes, SNARK_SCALAR_FIELD
+from sdk.ethsnarks.jubjub import Point
+from sdk.ethsnarks.serialize import ByteWriter, BitWriter
+
+
+class TestSerialize(unittest.TestCase):
+    def test_field_widths(self):
+        self.assertEqual((field_nbits(SNARK_SCALAR_FIELD), field_nbytes(SNARK_SCALAR_FIELD)), (254, 32))
+        # A whole number of bytes still gets an extra byte
+        self.assertEqual((field_nbits(251), field_nbytes(251)), (8, 2))
+        self.assertEqual(len(FQ(5, 251).to_bytes()), 2)
+
+    def test_bytes(self):
+        P = Point.from_hash(b'serialize')
+        x = FQ(0x1234)
+        expected = P.x.to_bytes('little') + P.y.to_bytes('little') + x.to_bytes('little')
+        expected += (7).to_bytes(32, 'little') + b'abc'
+        self.assertEqual(ByteWriter().write(P, [x, 7], b'abc').getvalue(), expected)
+        with self.assertRaises(TypeError):
+            ByteWriter().write(1.5)
+
+    def test_bits(self):
+        P = Point.from_hash(b'serialize')
+        x = FQ(0x1234)
+        expected = bitstring.BitArray()
+        for _ in (P.x.bits(), x.bits(), bitstring.BitArray(b'\x81\x02'), bitstring.BitArray('0b101')):
+            expected.append(_)
+        writer = BitWriter().write(P, x, b'\x81\x02', bitstring.BitArray('0b101'))
+        self.assertEqual(writer.to_bitarray(), expected)
+        bits = expected.bin
+        self.assertEqual(writer.windows(), [int(bits[i:i+3][::-1], 2) for i in range(0, len(bits), 3)])
+        self.assertEqual(BitWriter().windows(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
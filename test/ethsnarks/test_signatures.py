@@ -0,0 +1,131 @@
+import unittest
+
+from sdk.ethsnarks.field import FQ
+from sdk.ethsnarks.jubjub import JUBJUB_L
+from sdk.ethsnarks.eddsa import PoseidonEdDSA, MiMCEdDSA, PureEdDSA, Signature
+from sdk.ethsnarks.eddsa import EdDSASigner, PUBLIC_KEYS, VERIFIED_SIGNATURES, decompress_public_key
+from sdk.ethsnarks.jubjub import Point
+
+
+KEY = FQ(0x623167b48a61c02c546fef1bb0d810f4c0d14802b7669ef5b9de9af83212de)
+
+
+def _add_torsion(signed, torsion, to_R=True):
+    # Re-sign with a small-order point added to R or A, so that S·B - h·A - R
+    # is no longer zero but only has a small-order component
+    A, (R, S), msg = signed
+    h = PoseidonEdDSA._challenge(A, R, S, msg)[3]
+    r = (int(S) - h * int(KEY)) % JUBJUB_L
+    R, A = (R + torsion, A) if to_R else (R, A + torsion)
+    S = (r + PoseidonEdDSA._challenge(A, R, S, msg)[3] * int(KEY)) % JUBJUB_L
+    return signed._replace(A=A, sig=Signature(R, S))
+
+
+class TestVerifyBatch(unittest.TestCase):
+    def _signed(self, scheme, n):
+        return [scheme.sign(self._message(scheme, i), KEY) for i in range(n)]
+
+    def _message(self, scheme, i):
+        # PureEdDSA hashes the bits of the message, the others field elements
+        return b'message %d' % (i,) if scheme is PureEdDSA else i + 1
+
+    def test_schemes(self):
+        for scheme in (PoseidonEdDSA, MiMCEdDSA, PureEdDSA):
+            signed = self._signed(scheme, 3)
+            self.assertEqual(scheme.verify_batch(signed), [True] * 3)
+            # Signature over a different message
+            signed[1] = signed[1]._replace(msg=self._message(scheme, 5))
+            self.assertEqual(scheme.verify_batch(signed), [True, False, True])
+
+    def test_bisection(self):
+        signed = self._signed(PoseidonEdDSA, 9)
+        for i in (0, 4, 5):
+            sig = signed[i].sig
+            signed[i] = signed[i]._replace(sig=Signature(sig.R, (int(sig.s) + 1) % JUBJUB_L))
+        expected = [PoseidonEdDSA.verify(*_) for _ in signed]
+        self.assertEqual(expected, [i not in (0, 4, 5) for i in range(9)])
+        self.assertEqual(PoseidonEdDSA.verify_batch(signed), expected)
+        self.assertEqual(PoseidonEdDSA.verify_batch([]), [])
+
+    def test_small_order_components(self):
+        signed = self._signed(PoseidonEdDSA, 12)
+        torsion = Point.all_loworder_points()[1]
+        for i in (1, 4, 7):
+            signed[i] = _add_torsion(signed[i], torsion)
+        for i in (2, 5, 10):
+            signed[i] = _add_torsion(signed[i], torsion, to_R=False)
+        expected = [PoseidonEdDSA.verify(*_) for _ in signed]
+        # With A offset the error is h times the order-2 point, which vanishes for even h
+        self.assertEqual(expected.count(False), 3 + sum(
+            PoseidonEdDSA._challenge(signed[i].A, signed[i].sig.R, 0, signed[i].msg)[3] % 2 for i in (2, 5, 10)))
+        # The aggregate check alone would accept these about half of the time
+        for _ in range(16):
+            self.assertEqual(PoseidonEdDSA.verify_batch(signed), expected)
+
+
+class TestSigner(unittest.TestCase):
+    def test_matches_scheme(self):
+        for scheme in (PoseidonEdDSA, MiMCEdDSA, PureEdDSA):
+            signer = EdDSASigner(KEY, scheme)
+            msgs = [b'a', b'b'] if scheme is PureEdDSA else [1, 2]
+            self.assertEqual([str(_) for _ in signer.sign_many(msgs)],
+                             [str(scheme.sign(_, KEY)) for _ in msgs])
+            self.assertEqual(signer.A, scheme.B() * KEY)
+
+    def test_invalid_key(self):
+        with self.assertRaises(TypeError):
+            EdDSASigner(int(KEY))
+        with self.assertRaises(RuntimeError):
+            EdDSASigner(FQ(JUBJUB_L))
+
+
+class TestCaches(unittest.TestCase):
+    def tearDown(self):
+        VERIFIED_SIGNATURES.resize(0)
+        VERIFIED_SIGNATURES.clear()
+
+    def test_public_keys(self):
+        A = PoseidonEdDSA.B() * KEY
+        data = A.compress()
+        PUBLIC_KEYS.clear()
+        self.assertEqual(decompress_public_key(data), A)
+        self.assertEqual(decompress_public_key(data), A)
+        self.assertEqual(PUBLIC_KEYS.cache_info()[:2], (1, 1))
+        signed = PoseidonEdDSA.sign(5, KEY)
+        self.assertTrue(PoseidonEdDSA.verify(data, signed.sig, signed.msg))
+        self.assertEqual(decompress_public_key(bytearray(data)), A)
+        self.assertEqual(decompress_public_key(memoryview(data)), A)
+        for key in (bytearray(data), memoryview(data)):
+            self.assertTrue(PoseidonEdDSA.verify(key, signed.sig, signed.msg))
+        # Low order point, outside the prime-order subgroup
+        with self.assertRaises(ValueError):
+            decompress_public_key(Point.all_loworder_points()[1].compress())
+
+    def test_verified_signatures(self):
+        signed = [PoseidonEdDSA.sign(i, KEY) for i in range(1, 4)]
+        self.assertTrue(PoseidonEdDSA.verify(*signed[0]))
+        self.assertEqual(len(VERIFIED_SIGNATURES), 0)
+
+        VERIFIED_SIGNATURES.resize(16)
+        self.assertTrue(PoseidonEdDSA.verify(*signed[0]))
+        self.assertTrue(PoseidonEdDSA.verify(*signed[0]))
+        self.assertEqual(VERIFIED_SIGNATURES.cache_info()[:2], (1, 1))
+        self.assertEqual(PoseidonEdDSA.verify_batch(signed), [True] * 3)
+        self.assertEqual(VERIFIED_SIGNATURES.cache_info()[:2], (2, 3))
+        # Failures aren't cached, and the cache is per scheme
+        self.assertFalse(PoseidonEdDSA.verify(signed[1].A, signed[1].sig, 7))
+        self.assertFalse(MiMCEdDSA.verify(*signed[0]))
+        self.assertEqual(len(VERIFIED_SIGNATURES), 3)
+
+    def test_batch_only_caches_valid(self):
+        VERIFIED_SIGNATURES.resize(16)
+        signed = [PoseidonEdDSA.sign(i, KEY) for i in range(1, 5)]
+        signed[2] = _add_torsion(signed[2], Point.all_loworder_points()[1])
+        for _ in range(16):
+            self.assertEqual(PoseidonEdDSA.verify_batch(signed), [True, True, False, True])
+        self.assertEqual(len(VERIFIED_SIGNATURES), 3)
+        self.assertFalse(PoseidonEdDSA.verify(*signed[2]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+
+from sdk.sig_utils.eddsa_utils import OrderEddsaSignHelper
+from sdk.sig_utils.bulk_sign_utils import OrderBulkSigner
+
+
+PRIVATE_KEY = "0x5db65ed466a3b154dcf83e2e4b06b66c0c305d7d2088f9f60031567cf080dc1"
+
+
+def make_order(storageId):
+    return {
+        "exchange"      : "0x12b7cccF30ba360e5041C6Ce239C9a188B709b2B",
+        "accountId"     : 10037,
+        "storageId"     : storageId,
+        "sellToken"     : {"tokenId": 0, "volume": str(10**18)},
+        "buyToken"      : {"tokenId": 1, "volume": str(storageId * 10**17)},
+        "validUntil"    : 1700000000,
+        "maxFeeBips"    : 50,
+        "fillAmountBOrS": False,
+    }
+
+
+class TestBulkSigner(unittest.TestCase):
+
+    def test_matches_helper(self):
+        orders = [make_order(2 * i) for i in range(6)]
+        helper = OrderEddsaSignHelper(PRIVATE_KEY)
+        expected = [(helper.hash(_), helper.sign(_)) for _ in orders]
+        assert [helper.hash_and_sign(_) for _ in orders] == expected
+        for processes in (None, 2):
+            with OrderBulkSigner(PRIVATE_KEY, processes=processes, chunk_size=2) as signer:
+                assert signer.sign_many(orders) == expected
+                assert signer.sign_many([]) == []
@@ -51,6 +51,7 @@ if __name__ == "__main__":
     parser.add_argument("-O", "--orderid", help='order id to be cancelled')
     parser.add_argument("-H", "--orderhash", help='order hash to be cancelled')
     parser.add_argument("-T", "--queryType", help='operation type to be approved')
+    parser.add_argument("-P", "--processes", type=int, default=None, help='worker processes to sign orders in batch mode')
 
     args = parser.parse_args()
 
@@ -60,16 +61,19 @@ if __name__ == "__main__":
         print(f"srv time is {srv_time}")
     else:
         loopring_rest_sample.connect(loopring_exported_account)
-        if args.action == "buy":
+        if args.action in ["buy", "sell"]:
             buy_token, sell_token = args.market.split('-')
-            price =  float(args.price)
-            volume = float(args.volume)
-            loopring_rest_sample.send_order(buy_token, sell_token, True, price, volume)
-        elif args.action == "sell":
-            buy_token, sell_token = args.market.split('-')
-            price =  float(args.price)
-            volume = float(args.volume)
-            loopring_rest_sample.send_order(buy_token, sell_token, False, price, volume)
+            prices = [float(p) for p in args.price.split(',')]
+            volumes = [float(v) for v in args.volume.split(',')]
+            if len(prices) == 1 and len(volumes) == 1:
+                loopring_rest_sample.send_order(buy_token, sell_token, args.action == "buy", prices[0], volumes[0])
+            else:
+                # batch mode, one volume for all prices or one volume per price
+                if len(volumes) == 1:
+                    volumes = volumes * len(prices)
+                assert len(prices) == len(volumes)
+                orders = [(buy_token, sell_token, args.action == "buy", price, volume) for price, volume in zip(prices, volumes)]
+                loopring_rest_sample.send_orders(orders, processes=args.processes)
         elif args.action == "cancel":
             cancal_params = {}
             if args.orderhash: